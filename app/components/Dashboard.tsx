@@ -169,7 +169,7 @@ export const Dashboard: React.FC<DashboardProps> = ({ onSignOut }) => {
           <MetricsCard
             title="Unique Customers"
             value={metrics?.sales_metrics?.unique_customers || 0}
-            description="Individual customers"
+            description={metrics?.approximate ? "Individual customers (estimated)" : "Individual customers"}
             icon={<Users className="w-4 h-4 text-muted-foreground" />}
             loading={loading}
           />
@@ -23,7 +23,7 @@ export const FileUpload: React.FC<FileUploadProps> = ({ onUploadSuccess }) => {
     setSuccess(null);
 
     if (rejectedFiles.length > 0) {
-      setError('Please upload a valid CSV file under 5MB');
+      setError('Please upload a valid CSV file under 10GB');
       return;
     }
 
@@ -37,7 +37,7 @@ export const FileUpload: React.FC<FileUploadProps> = ({ onUploadSuccess }) => {
     accept: {
       'text/csv': ['.csv'],
     },
-    maxSize: 5 * 1024 * 1024, // 5MB
+    maxSize: 10 * 1024 * 1024 * 1024, // 10GB
     multiple: false,
   });
 
@@ -102,7 +102,7 @@ export const FileUpload: React.FC<FileUploadProps> = ({ onUploadSuccess }) => {
                     {isDragActive ? 'Drop your CSV file here' : 'Drag & drop your CSV file here'}
                   </p>
                   <p className="text-xs text-muted-foreground mt-1">
-                    or click to browse (max 5MB)
+                    or click to browse (max 10GB)
                   </p>
                 </div>
               </>
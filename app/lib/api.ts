@@ -56,6 +56,23 @@ export const uploadApi = {
         'Content-Type': 'multipart/form-data',
       },
     });
+
+    // Uploads are processed in the background; poll until the job finishes
+    const { job_id } = response.data;
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const job = await uploadApi.getJob(job_id);
+      if (job.status === 'succeeded') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw { response: { data: { detail: job.error } } };
+      }
+    }
+  },
+
+  getJob: async (jobId: string) => {
+    const response = await api.get(`/api/upload/jobs/${jobId}`);
     return response.data;
   },
 };
@@ -68,6 +85,8 @@ export const ordersApi = {
     item_sku?: string;
     limit?: number;
     offset?: number;
+    cursor?: string;
+    count?: 'exact' | 'estimate';
   }) => {
     const response = await api.get('/api/orders', { params });
     return response.data;
@@ -78,20 +97,55 @@ export const metricsApi = {
   getDashboardMetrics: async (params: {
     start_date?: string;
     end_date?: string;
+    approximate?: boolean;
+    granularity?: 'auto' | 'hour' | 'day' | 'week' | 'month';
+    max_points?: number;
+    compare?: 'previous' | 'yoy';
   }) => {
     const response = await api.get('/api/metrics/dashboard', { params });
     return response.data;
   },
+
+  getMapMetrics: async (params: {
+    start_date?: string;
+    end_date?: string;
+    min_lat?: number;
+    min_lng?: number;
+    max_lat?: number;
+    max_lng?: number;
+    zoom?: number;
+    level?: 'grid' | 'zip';
+  }) => {
+    const response = await api.get('/api/metrics/map', { params });
+    return response.data;
+  },
+
+  getHeatmap: async (params: {
+    start_date?: string;
+    end_date?: string;
+  }) => {
+    const response = await api.get('/api/metrics/heatmap', { params });
+    return response.data;
+  },
+};
+
+export type ExportFormat = 'excel' | 'csv' | 'parquet' | 'arrow';
+
+const EXPORT_EXTENSIONS: Record<ExportFormat, string> = {
+  excel: 'xlsx',
+  csv: 'csv',
+  parquet: 'parquet',
+  arrow: 'arrows',
 };
 
 export const exportApi = {
-  exportToExcel: async (params: {
+  exportOrders: async (format: ExportFormat, params: {
     start_date?: string;
     end_date?: string;
     state?: string;
     item_sku?: string;
   }) => {
-    const response = await api.get('/api/export/excel', {
+    const response = await api.get(`/api/export/${format}`, {
       params,
       responseType: 'blob',
     });
@@ -100,12 +154,19 @@ export const exportApi = {
     const url = window.URL.createObjectURL(new Blob([response.data]));
     const link = document.createElement('a');
     link.href = url;
-    link.setAttribute('download', `order_analytics_${new Date().toISOString().split('T')[0]}.xlsx`);
+    link.setAttribute('download', `order_analytics_${new Date().toISOString().split('T')[0]}.${EXPORT_EXTENSIONS[format]}`);
     document.body.appendChild(link);
     link.click();
     link.remove();
     window.URL.revokeObjectURL(url);
   },
+
+  exportToExcel: async (params: {
+    start_date?: string;
+    end_date?: string;
+    state?: string;
+    item_sku?: string;
+  }) => exportApi.exportOrders('excel', params),
 };
 
 export default api;
\ No newline at end of file
@@ -2,8 +2,9 @@
 
 from fastapi import APIRouter, HTTPException, status
 
+from core.config import settings
 from core.security import authenticate_user, create_access_token
-from core.database import clear_orders
+from core.database import clear_orders, run_write
 from schemas.auth import LoginRequest, LoginResponse
 
 
@@ -22,8 +23,9 @@ async def login(credentials: LoginRequest):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Clear database for fresh demo start
-    clear_orders()
+    # Clear database for fresh demo start, unless data is meant to persist
+    if not settings.DATABASE_PERSISTENT:
+        await run_write(clear_orders)
     
     # Create access token
     access_token = create_access_token(
@@ -47,7 +49,8 @@ async def login(credentials: LoginRequest):
 @router.post("/logout")
 async def logout():
     """Logout endpoint - clears data for clean demo."""
-    # Clear all orders data
-    clear_orders()
+    # Clear all orders data, unless data is meant to persist
+    if not settings.DATABASE_PERSISTENT:
+        await run_write(clear_orders)
     
     return {"message": "Logged out successfully"}
\ No newline at end of file
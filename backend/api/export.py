@@ -1,19 +1,45 @@
 """Export endpoints."""
 
-import io
-from typing import Optional
+import os
+import shutil
+import tempfile
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime
 
-import pandas as pd
+import pyarrow as pa
 from fastapi import APIRouter, Query, Depends
 from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
 
-from core.database import get_connection
+from core.config import settings
+from core.database import stream_read
 from core.security import require_role
 
 
 router = APIRouter()
 
+# Exported order columns, in file order
+EXPORT_COLUMNS = [
+    "order_id",
+    "order_date",
+    "customer_name",
+    "address_line",
+    "city",
+    "state",
+    "zip_code",
+    "item_sku",
+    "item_name",
+    "quantity",
+    "unit_price_usd",
+    "order_total",
+]
+
+# Widest auto-sized Excel column, in characters
+MAX_EXCEL_COLUMN_WIDTH = 50
+
 
 @router.get("/excel")
 async def export_to_excel(
@@ -23,94 +49,199 @@ async def export_to_excel(
     item_sku: Optional[str] = Query(None),
     _: dict = Depends(require_role("viewer"))
 ):
-    """Export filtered orders to Excel."""
-    conn = get_connection()
-    
-    # Build query
+    """Export filtered orders to Excel.
+
+    The workbook is streamed to the client while it is being written.
+    """
+    return _download(
+        _write_excel, (start_date, end_date, state, item_sku), "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+@router.get("/csv")
+async def export_to_csv(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    state: Optional[str] = Query(None),
+    item_sku: Optional[str] = Query(None),
+    _: dict = Depends(require_role("viewer"))
+):
+    """Export filtered orders to CSV with a header row."""
+    return _download(
+        _write_copy, ("FORMAT CSV, HEADER", start_date, end_date, state, item_sku), "csv", "text/csv"
+    )
+
+
+@router.get("/parquet")
+async def export_to_parquet(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    state: Optional[str] = Query(None),
+    item_sku: Optional[str] = Query(None),
+    _: dict = Depends(require_role("viewer"))
+):
+    """Export filtered orders to Parquet."""
+    return _download(
+        _write_copy, ("FORMAT PARQUET", start_date, end_date, state, item_sku), "parquet",
+        "application/vnd.apache.parquet",
+    )
+
+
+@router.get("/arrow")
+async def export_to_arrow(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    state: Optional[str] = Query(None),
+    item_sku: Optional[str] = Query(None),
+    _: dict = Depends(require_role("viewer"))
+):
+    """Export filtered orders in the Arrow IPC streaming format.
+
+    Record batches are sent as DuckDB produces them.
+    """
+    return _download(
+        _write_arrow, (start_date, end_date, state, item_sku), "arrows",
+        "application/vnd.apache.arrow.stream",
+    )
+
+
+def _download(writer: Callable, args: Tuple, extension: str, media_type: str) -> StreamingResponse:
+    """Stream what ``writer`` writes as a file attachment."""
+    # Generate filename
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"order_analytics_{timestamp}.{extension}"
+
+    return StreamingResponse(
+        stream_read(writer, *args),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}"
+        }
+    )
+
+
+def _order_filters(
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+) -> Tuple[str, List]:
+    """Build the WHERE clause and parameters for the export filters."""
     where_clauses = []
     params = []
-    
+
     if start_date:
         where_clauses.append("order_date >= ?")
         params.append(start_date)
-    
+
     if end_date:
         where_clauses.append("order_date <= ?")
         params.append(end_date)
-    
+
     if state:
         where_clauses.append("state = ?")
         params.append(state)
-    
+
     if item_sku:
         where_clauses.append("item_sku = ?")
         params.append(item_sku)
-    
-    # Build final query
-    query = """
-        SELECT 
-            order_id,
-            order_date,
-            customer_name,
-            address_line,
-            city,
-            state,
-            zip_code,
-            item_sku,
-            item_name,
-            quantity,
-            unit_price_usd,
-            order_total
-        FROM orders
+
+    where = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    return where, params
+
+
+def _export_query(
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+) -> Tuple[str, List]:
+    """Build the query for the exported orders, newest first."""
+    where, params = _order_filters(start_date, end_date, state, item_sku)
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM orders{where} ORDER BY order_date DESC"
+    return query, params
+
+
+def _write_copy(
+    conn,
+    out,
+    options: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+):
+    """Write filtered orders to ``out`` with DuckDB's ``COPY ... TO``.
+
+    DuckDB writes the file with all its threads into a temporary directory;
+    it is then copied to ``out`` in chunks and removed.
     """
-    
-    if where_clauses:
-        query += " WHERE " + " AND ".join(where_clauses)
-    
-    query += " ORDER BY order_date DESC"
-    
-    # Execute query
-    df = conn.execute(query, params).fetchdf()
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Orders', index=False)
-        
-        # Get the worksheet
-        worksheet = writer.sheets['Orders']
-        
-        # Style the header row
-        for cell in worksheet[1]:
-            cell.font = cell.font.copy(bold=True)
-            cell.fill = cell.fill.copy(fgColor="E0E0E0")
-        
-        # Auto-adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-    
-    output.seek(0)
-    
-    # Generate filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"order_analytics_{timestamp}.xlsx"
-    
-    return StreamingResponse(
-        io.BytesIO(output.read()),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
-    )
\ No newline at end of file
+    query, params = _export_query(start_date, end_date, state, item_sku)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export")
+        conn.execute(f"COPY ({query}) TO '{path}' ({options})", params)
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, out, settings.EXPORT_CHUNK_BYTES)
+
+
+def _write_arrow(
+    conn,
+    out,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+):
+    """Write filtered orders to ``out`` as an Arrow IPC stream, batch by batch."""
+    query, params = _export_query(start_date, end_date, state, item_sku)
+    batches = conn.execute(query, params).fetch_record_batch(settings.EXPORT_BATCH_ROWS)
+    with pa.ipc.new_stream(out, batches.schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def _write_excel(
+    conn,
+    out,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+):
+    """Write filtered orders to ``out`` as a workbook, one batch of rows at a time.
+
+    The write-only workbook keeps rows in a temporary file rather than in
+    memory, and ``out`` receives the zipped file as it is compressed.
+    """
+    where, params = _order_filters(start_date, end_date, state, item_sku)
+
+    # Widths must be set before the first row, so measure the values in SQL
+    lengths = conn.execute(
+        "SELECT "
+        + ", ".join(f"max(length(CAST({column} AS VARCHAR)))" for column in EXPORT_COLUMNS)
+        + f" FROM orders{where}",
+        params,
+    ).fetchone()
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Orders")
+    for index, (column, length) in enumerate(zip(EXPORT_COLUMNS, lengths), start=1):
+        width = max(len(column), length or 0) + 2
+        worksheet.column_dimensions[get_column_letter(index)].width = min(width, MAX_EXCEL_COLUMN_WIDTH)
+
+    # Style the header row
+    header = []
+    for column in EXPORT_COLUMNS:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill("solid", fgColor="E0E0E0")
+        header.append(cell)
+    worksheet.append(header)
+
+    conn.execute(*_export_query(start_date, end_date, state, item_sku))
+    while rows := conn.fetchmany(settings.EXPORT_BATCH_ROWS):
+        for row in rows:
+            worksheet.append(row)
+
+    workbook.save(out)
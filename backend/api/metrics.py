@@ -1,69 +1,1050 @@
 """Metrics and analytics endpoints."""
 
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta, timezone
 from decimal import Decimal
 
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import Response
 
-from core.database import get_connection
+from core.cache import metrics_cache
+from core.columnar import dumps
+from core.config import settings
+from core.database import get_dataset_version, run_read, to_naive_utc
+from core.rollups import ROLLUPS, estimate_distinct
 from core.security import require_role
+from core.tiles import TILE_ZOOM, quadkey, tile_of
+from services.downsampling import lttb
 from schemas.metrics import (
     DashboardMetrics,
     SalesMetrics,
     ProductMetrics,
     TimeSeriesMetric,
-    GeographicMetric
+    GeographicMetric,
+    ItemComparison,
+    PeriodComparison,
+    MapMetrics,
+    WeekdayHourHeatmap
 )
 
 
+# Handlers return cached, pre-serialized JSON bytes, so their schemas are
+# declared with ``responses=`` for the API docs rather than ``response_model``
 router = APIRouter()
 
+# Time series bucket expressions over orders (or rollup) columns
+TIME_BUCKETS = {
+    "hour": "date_trunc('hour', order_date)",
+    "day": "order_day",
+    "week": "date_trunc('week', order_day)",
+    "month": "date_trunc('month', order_day)",
+}
 
-@router.get("/dashboard", response_model=DashboardMetrics)
+# "auto" granularity: the longest range in days each bucket size is used for;
+# anything longer is bucketed by month
+AUTO_GRANULARITY = [(2, "hour"), (92, "day"), (731, "week")]
+
+
+@router.get("/dashboard", responses={200: {"model": DashboardMetrics}})
 async def get_dashboard_metrics(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    approximate: bool = Query(False, description="Estimate distinct counts with HyperLogLog"),
+    response_format: str = Query("json", alias="format", pattern="^(json|columnar)$"),
+    granularity: str = Query("auto", pattern="^(auto|hour|day|week|month)$"),
+    max_points: Optional[int] = Query(None, ge=3, description="Time series point budget"),
+    compare: Optional[str] = Query(None, pattern="^(previous|yoy)$"),
+    _: dict = Depends(require_role("viewer"))
+):
+    """Get comprehensive dashboard metrics.
+    
+    The time series is bucketed by ``granularity`` (``auto`` picks it from
+    the range) and has at most ``max_points`` points. ``compare`` adds the
+    previous period, or the same range a year earlier, and the changes
+    against it. ``format=columnar`` returns list sections as parallel arrays.
+    """
+    start_date, end_date = _default_range(start_date, end_date)
+    
+    if compare and comparison_range(compare, start_date, end_date)[1] >= start_date:
+        raise HTTPException(
+            status_code=400,
+            detail="Year-over-year comparison needs a range shorter than a year"
+        )
+    
+    granularity = resolve_granularity(granularity, start_date, end_date)
+    max_points = min(
+        max_points or settings.METRICS_MAX_TIME_SERIES_POINTS,
+        settings.METRICS_MAX_TIME_SERIES_POINTS
+    )
+    
+    cache_key = (
+        "dashboard", get_dataset_version(), start_date, end_date, approximate,
+        response_format, granularity, max_points, compare
+    )
+    body = metrics_cache.get(cache_key)
+    if body is None:
+        serialize = _dashboard_columnar_json if response_format == "columnar" else _dashboard_json
+        body = await run_read(
+            serialize, start_date, end_date, approximate, granularity, max_points, compare
+        )
+        metrics_cache.put(cache_key, body)
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/map", responses={200: {"model": MapMetrics}})
+async def get_map_metrics(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    min_lat: float = Query(-90, ge=-90, le=90),
+    min_lng: float = Query(-180, ge=-180, le=180),
+    max_lat: float = Query(90, ge=-90, le=90),
+    max_lng: float = Query(180, ge=-180, le=180),
+    zoom: int = Query(3, ge=0, le=22, description="Map zoom level"),
+    level: str = Query("grid", pattern="^(grid|zip)$"),
+    _: dict = Depends(require_role("viewer"))
+):
+    """Get order totals per map cell inside a bounding box.
+    
+    ``level=grid`` buckets orders into tiles ``MAP_CELL_ZOOM_OFFSET`` zoom
+    levels finer than ``zoom``, named by quadkey; ``level=zip`` groups by
+    ZIP code. Only cells inside the box are returned, highest revenue
+    first. A box with ``min_lng > max_lng`` crosses the antimeridian.
+    """
+    start_date, end_date = _default_range(start_date, end_date)
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    
+    cell_zoom = min(zoom + settings.MAP_CELL_ZOOM_OFFSET, TILE_ZOOM) if level == "grid" else None
+    bbox = (min_lat, min_lng, max_lat, max_lng)
+    cache_key = ("map", get_dataset_version(), start_date, end_date, bbox, cell_zoom, level)
+    body = metrics_cache.get(cache_key)
+    if body is None:
+        body = await run_read(_map_json, start_date, end_date, bbox, cell_zoom, level)
+        metrics_cache.put(cache_key, body)
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/heatmap", responses={200: {"model": WeekdayHourHeatmap}})
+async def get_weekday_hour_heatmap(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     _: dict = Depends(require_role("viewer"))
 ):
-    """Get comprehensive dashboard metrics."""
-    conn = get_connection()
+    """Get order counts and revenue by weekday and hour of day."""
+    start_date, end_date = _default_range(start_date, end_date)
+    
+    cache_key = ("heatmap", get_dataset_version(), start_date, end_date)
+    body = metrics_cache.get(cache_key)
+    if body is None:
+        body = await run_read(_heatmap_json, start_date, end_date)
+        metrics_cache.put(cache_key, body)
     
-    # Default to last 30 days if no dates provided
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/cache")
+async def get_metrics_cache_stats(
+    _: dict = Depends(require_role("admin"))
+):
+    """Get metrics result cache statistics."""
+    return {
+        **metrics_cache.stats(),
+        "dataset_version": get_dataset_version(),
+    }
+
+
+def _default_range(
+    start_date: Optional[datetime], end_date: Optional[datetime]
+) -> Tuple[datetime, datetime]:
+    """Fill in a missing range with the last 30 days.
+    
+    Both bounds come back as naive UTC, like the stored order dates. The
+    default end is rounded up to the minute so repeat loads share a cache
+    key.
+    """
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
     if not end_date:
-        end_date = datetime.now()
+        now = datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+        end_date = now + timedelta(minutes=1)
     if not start_date:
         start_date = end_date - timedelta(days=30)
+    return start_date, end_date
+
+
+def _dashboard_json(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool,
+    granularity: str,
+    max_points: Optional[int],
+    compare: Optional[str],
+) -> str:
+    """Compute and serialize dashboard metrics off the event loop."""
+    return compute_dashboard_metrics(
+        conn, start_date, end_date, approximate, granularity, max_points, compare
+    ).model_dump_json()
+
+
+def _dashboard_columnar_json(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool,
+    granularity: str,
+    max_points: Optional[int],
+    compare: Optional[str],
+) -> bytes:
+    """Compute and serialize columnar dashboard metrics off the event loop."""
+    return dumps(compute_dashboard_columns(
+        conn, start_date, end_date, approximate, granularity, max_points, compare
+    ))
+
+
+def _map_json(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    bbox: Tuple[float, float, float, float],
+    cell_zoom: Optional[int],
+    level: str,
+) -> str:
+    """Compute and serialize map metrics off the event loop."""
+    return compute_map_metrics(
+        conn, start_date, end_date, bbox, cell_zoom, level
+    ).model_dump_json()
+
+
+def _heatmap_json(conn, start_date: datetime, end_date: datetime) -> str:
+    """Compute and serialize the weekday/hour heatmap off the event loop."""
+    return compute_weekday_hour_heatmap(conn, start_date, end_date).model_dump_json()
+
+
+def resolve_granularity(granularity: str, start_date: datetime, end_date: datetime) -> str:
+    """Pick the time series bucket size for ``auto`` from the range length."""
+    if granularity != "auto":
+        return granularity
+    days = (end_date - start_date).total_seconds() / 86400
+    for max_days, bucket in AUTO_GRANULARITY:
+        if days <= max_days:
+            return bucket
+    return "month"
+
+
+def comparison_range(
+    compare: str, start_date: datetime, end_date: datetime
+) -> Tuple[datetime, datetime]:
+    """Range to compare against: the equally long span just before the
+    requested range (``previous``) or the same range a year earlier (``yoy``)."""
+    if compare == "yoy":
+        return _year_earlier(start_date), _year_earlier(end_date)
+    previous_end = start_date - timedelta(microseconds=1)
+    return previous_end - (end_date - start_date), previous_end
+
+
+def _year_earlier(value: datetime) -> datetime:
+    """The same moment a year earlier; 29 February maps to the 28th."""
+    try:
+        return value.replace(year=value.year - 1)
+    except ValueError:
+        return value.replace(year=value.year - 1, day=28)
+
+
+def compute_dashboard_metrics(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool = False,
+    granularity: str = "day",
+    max_points: Optional[int] = None,
+    compare: Optional[str] = None,
+) -> DashboardMetrics:
+    """Compute dashboard metrics with the configured query mode.
     
+    With ``approximate`` distinct counts are HyperLogLog estimates and the
+    response is flagged accordingly. The time series is bucketed by
+    ``granularity`` and downsampled to ``max_points`` when given. With
+    ``compare`` the previous period is aggregated in the same pass.
+    """
+    previous = comparison_range(compare, start_date, end_date) if compare else None
+    if settings.METRICS_QUERY_MODE == "separate":
+        metrics = _get_dashboard_separate(
+            conn, start_date, end_date, approximate, granularity, compare
+        )
+        metrics.time_series = _downsample(
+            metrics.time_series, max_points, lambda point: (point.date, point.revenue)
+        )
+        return metrics
+    
+    results = _query_dashboard_groups(
+        conn, start_date, end_date, approximate, granularity, previous
+    )
+    return _build_dashboard(
+        results, start_date, end_date,
+        approximate=approximate,
+        granularity=granularity,
+        max_points=max_points,
+        compare=compare,
+        previous=previous,
+    )
+
+
+def compute_dashboard_columns(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool = False,
+    granularity: str = "day",
+    max_points: Optional[int] = None,
+    compare: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Compute dashboard metrics with list sections as parallel arrays."""
+    if settings.METRICS_QUERY_MODE == "separate":
+        metrics = compute_dashboard_metrics(
+            conn, start_date, end_date, approximate, granularity, max_points, compare
+        )
+        return {
+            "sales_metrics": metrics.sales_metrics.model_dump(),
+            "top_products": _models_to_columns(metrics.top_products, ProductMetrics),
+            "time_series": _models_to_columns(metrics.time_series, TimeSeriesMetric),
+            "geographic_distribution": _models_to_columns(
+                metrics.geographic_distribution, GeographicMetric
+            ),
+            "approximate": approximate,
+            "granularity": granularity,
+            "comparison": _comparison_columns(metrics.comparison),
+        }
+    
+    previous = comparison_range(compare, start_date, end_date) if compare else None
+    results = _query_dashboard_groups(
+        conn, start_date, end_date, approximate, granularity, previous
+    )
+    return _build_dashboard_columns(
+        results, start_date, end_date,
+        approximate=approximate,
+        granularity=granularity,
+        max_points=max_points,
+        compare=compare,
+        previous=previous,
+    )
+
+
+def _models_to_columns(items: list, model) -> Dict[str, List[Any]]:
+    """Transpose a list of models into parallel arrays per field."""
+    return {name: [getattr(item, name) for item in items] for name in model.model_fields}
+
+
+def _comparison_columns(comparison: Optional[PeriodComparison]) -> Optional[Dict[str, Any]]:
+    """Comparison with its item lists transposed into parallel arrays."""
+    if comparison is None:
+        return None
+    return {
+        **comparison.model_dump(),
+        "top_products": _models_to_columns(comparison.top_products, ItemComparison),
+        "geographic_distribution": _models_to_columns(
+            comparison.geographic_distribution, ItemComparison
+        ),
+    }
+
+
+def _downsample(points: list, max_points: Optional[int], bucket_and_revenue) -> list:
+    """Reduce a time series to ``max_points`` with LTTB over revenue.
+    
+    ``bucket_and_revenue`` maps a point to its bucket start and revenue.
+    """
+    if not max_points or len(points) <= max_points:
+        return points
+    
+    xs, ys = [], []
+    for point in points:
+        bucket, revenue = bucket_and_revenue(point)
+        if not isinstance(bucket, datetime):
+            bucket = datetime.combine(bucket, time.min)
+        xs.append(bucket.timestamp())
+        ys.append(float(revenue))
+    return [points[index] for index in lttb(xs, ys, max_points)]
+
+
+def _get_dashboard_separate(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool = False,
+    granularity: str = "day",
+    compare: Optional[str] = None,
+) -> DashboardMetrics:
+    """Compute dashboard metrics with one query per section.
+    
+    The comparison period, if any, is queried separately as well.
+    """
     # Get sales metrics
-    sales_metrics = _get_sales_metrics(conn, start_date, end_date)
+    sales_metrics = _get_sales_metrics(conn, start_date, end_date, approximate)
+    total_revenue = sales_metrics.total_revenue
     
     # Get top products
-    top_products = _get_top_products(conn, start_date, end_date)
+    top_products = _get_top_products(conn, start_date, end_date, total_revenue=total_revenue)
     
     # Get time series data
-    time_series = _get_time_series(conn, start_date, end_date)
+    time_series = _get_time_series(conn, start_date, end_date, granularity)
     
     # Get geographic distribution
-    geographic_distribution = _get_geographic_distribution(conn, start_date, end_date)
+    geographic_distribution = _get_geographic_distribution(
+        conn, start_date, end_date, total_revenue=total_revenue
+    )
+    
+    comparison = None
+    if compare:
+        previous_start, previous_end = comparison_range(compare, start_date, end_date)
+        previous_sales = _get_sales_metrics(conn, previous_start, previous_end, approximate)
+        previous_products = _get_top_products(
+            conn, previous_start, previous_end, limit=None,
+            total_revenue=previous_sales.total_revenue
+        )
+        previous_states = _get_geographic_distribution(
+            conn, previous_start, previous_end, total_revenue=previous_sales.total_revenue
+        )
+        comparison = _compare_periods(
+            compare,
+            sales_metrics,
+            previous_sales,
+            [(product.item_sku, product.revenue) for product in top_products],
+            {product.item_sku: (product.revenue, product.order_count) for product in previous_products},
+            [(state.location, state.revenue) for state in geographic_distribution],
+            {state.location: (state.revenue, state.order_count) for state in previous_states},
+        )
     
     return DashboardMetrics(
         sales_metrics=sales_metrics,
         top_products=top_products,
         time_series=time_series,
-        geographic_distribution=geographic_distribution
+        geographic_distribution=geographic_distribution,
+        approximate=approximate,
+        granularity=granularity,
+        comparison=comparison
     )
 
 
-def _get_sales_metrics(conn, start_date: datetime, end_date: datetime) -> SalesMetrics:
-    """Calculate overall sales metrics."""
+def _count_distinct(column: str, approximate: bool) -> str:
+    """SQL for an exact or HyperLogLog distinct count of ``column``."""
+    if approximate:
+        return f"approx_count_distinct({column})"
+    return f"COUNT(DISTINCT {column})"
+
+
+def _query_dashboard_groups(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool,
+    granularity: str = "day",
+    previous: Optional[Tuple[datetime, datetime]] = None,
+) -> list:
+    """Fetch GROUPING SETS rows for the dashboard with the configured mode.
+    
+    Rows are described in ``_split_groups``. ``previous`` is a range before
+    ``start_date`` to aggregate in the same pass as period 1. Hourly buckets
+    are finer than the daily rollup, so they always scan raw orders.
+    """
+    if settings.METRICS_QUERY_MODE == "rollup" and granularity != "hour":
+        return _query_rollup(conn, start_date, end_date, approximate, granularity, previous)
+    return _query_single_scan(conn, start_date, end_date, approximate, granularity, previous)
+
+
+def _query_single_scan(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool = False,
+    granularity: str = "day",
+    previous: Optional[Tuple[datetime, datetime]] = None,
+) -> list:
+    """Compute every dashboard section from one scan of the filtered orders.
+    
+    A single GROUPING SETS query aggregates the date-filtered rows into the
+    period total, per-product, per-time-bucket and per-state groups;
+    ``GROUPING`` tells the groups apart. Rows of the ``previous`` range are
+    read by the same scan and grouped separately by ``period``. order_id is
+    the primary key, so ``COUNT(*)`` counts distinct orders within any group.
+    """
+    ranges = [(start_date, end_date)] + ([previous] if previous else [])
+    range_filter = " OR ".join(["(order_date >= ? AND order_date <= ?)"] * len(ranges))
+    query = f"""
+        WITH filtered AS (
+            SELECT order_total, quantity, customer_name, state,
+                   {TIME_BUCKETS[granularity]} AS bucket,
+                   item_sku, item_name, latitude, longitude,
+                   CASE WHEN order_date >= ? THEN 0 ELSE 1 END AS period
+            FROM orders
+            WHERE {range_filter}
+        )
+        SELECT
+            GROUPING(item_sku, item_name, bucket, state) AS grouping_id,
+            item_sku,
+            item_name,
+            bucket,
+            state,
+            SUM(order_total) AS revenue,
+            COUNT(*) AS order_count,
+            SUM(quantity) AS items_sold,
+            AVG(order_total) AS avg_order_value,
+            {_count_distinct("customer_name", approximate)} AS unique_customers,
+            COUNT(DISTINCT state) AS unique_states,
+            AVG(latitude) AS avg_lat,
+            AVG(longitude) AS avg_lng,
+            period
+        FROM filtered
+        GROUP BY GROUPING SETS (
+            (period), (period, item_sku, item_name), (period, bucket), (period, state)
+        )
+    """
+    
+    params = [start_date] + [value for period_range in ranges for value in period_range]
+    return conn.execute(query, params).fetchall()
+
+
+def _full_day_range(start_date: datetime, end_date: datetime) -> Tuple[date, date]:
+    """Days lying entirely inside ``[start_date, end_date]``, half-open."""
+    first_day = start_date.date()
+    if start_date.time() != time.min:
+        first_day += timedelta(days=1)
+    last_day = (end_date + timedelta(microseconds=1)).date()
+    return first_day, last_day
+
+
+def _query_rollup(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    approximate: bool = False,
+    granularity: str = "day",
+    previous: Optional[Tuple[datetime, datetime]] = None,
+) -> list:
+    """Compute dashboard groups from ``daily_rollup`` where possible.
+    
+    Days the range covers completely are read from the rollup; the partial
+    days at either edge are aggregated from raw orders into the same shape.
+    A range without any full day therefore falls back to raw rows
+    entirely. The ``previous`` range is planned the same way and tagged as
+    period 1. Distinct customers cannot be summed across rollup rows. With
+    ``approximate`` they are estimated by merging the per-day
+    ``customer_sketch`` with sketches of the edges; otherwise the exact
+    count falls back to a full scan of the range's raw orders, so only
+    approximate requests have a cost that depends on the number of days
+    rather than orders. Either is written into the period total rows.
+    """
+    ranges = [(start_date, end_date)] + ([previous] if previous else [])
+    day_ranges = [_full_day_range(*period_range) for period_range in ranges]
+    rollup_filter = " OR ".join(["(order_day >= ? AND order_day < ?)"] * len(ranges))
+    edge_filter = """
+        order_date >= ? AND order_date <= ?
+        AND (order_day < ? OR order_day >= ?)
+    """
+    rollup_params = [day for days in day_ranges for day in days]
+    edge_params = [
+        value
+        for period_range, days in zip(ranges, day_ranges)
+        for value in (*period_range, *days)
+    ]
+    # Previous periods end before the first full day of the current one
+    rollup_period = "CASE WHEN order_day >= ? THEN 0 ELSE 1 END"
+    order_period = "CASE WHEN order_date >= ? THEN 0 ELSE 1 END"
+    
+    query = f"""
+        WITH facts AS (
+            SELECT {rollup_period} AS period,
+                   order_day, state, item_sku, item_name, revenue, quantity,
+                   order_count, lat_sum, lng_sum, geo_count
+            FROM daily_rollup
+            WHERE {rollup_filter}
+            UNION ALL
+            SELECT {order_period} AS period,
+                   order_day, state, item_sku, item_name, SUM(order_total),
+                   SUM(quantity), COUNT(*), SUM(latitude), SUM(longitude),
+                   COUNT(latitude)
+            FROM orders
+            WHERE {" OR ".join([f"({edge_filter})"] * len(ranges))}
+            GROUP BY period, order_day, state, item_sku, item_name
+        )
+        SELECT
+            GROUPING(item_sku, item_name, bucket, state) AS grouping_id,
+            item_sku,
+            item_name,
+            bucket,
+            state,
+            SUM(revenue) AS revenue,
+            SUM(order_count) AS order_count,
+            SUM(quantity) AS items_sold,
+            SUM(revenue) / NULLIF(SUM(order_count), 0) AS avg_order_value,
+            NULL AS unique_customers,
+            COUNT(DISTINCT state) AS unique_states,
+            SUM(lat_sum) / NULLIF(SUM(geo_count), 0) AS avg_lat,
+            SUM(lng_sum) / NULLIF(SUM(geo_count), 0) AS avg_lng,
+            period
+        FROM (SELECT *, {TIME_BUCKETS[granularity]} AS bucket FROM facts)
+        GROUP BY GROUPING SETS (
+            (period), (period, item_sku, item_name), (period, bucket), (period, state)
+        )
+    """
+    
+    results = conn.execute(query, [
+        day_ranges[0][0], *rollup_params, start_date, *edge_params
+    ]).fetchall()
+    
+    if approximate:
+        edge_sketch = ROLLUPS["customer_sketch"][1].format(where=f"WHERE {edge_filter}")
+        edge_sketches = " UNION ALL ".join(
+            f"SELECT {period} AS period, register, rank FROM ({edge_sketch})"
+            for period in range(len(ranges))
+        )
+        ranks = conn.execute(f"""
+            SELECT period, MAX(rank) FROM (
+                SELECT {rollup_period} AS period, register, rank
+                FROM customer_sketch
+                WHERE {rollup_filter}
+                UNION ALL
+                {edge_sketches}
+            )
+            GROUP BY period, register
+        """, [day_ranges[0][0], *rollup_params, *edge_params]).fetchall()
+        
+        registers = {}
+        for period, rank in ranks:
+            registers.setdefault(period, []).append(rank)
+        unique_customers = {
+            period: estimate_distinct(period_ranks) for period, period_ranks in registers.items()
+        }
+    else:
+        # Exact distinct customers have no rollup: scan every order in range
+        unique_customers = dict(conn.execute(f"""
+            SELECT {order_period} AS period, COUNT(DISTINCT customer_name)
+            FROM orders
+            WHERE {" OR ".join(["(order_date >= ? AND order_date <= ?)"] * len(ranges))}
+            GROUP BY period
+        """, [start_date] + [value for period_range in ranges for value in period_range]).fetchall())
+    
+    return [
+        row[:9] + (unique_customers.get(row[13], 0),) + row[10:] if row[0] == 0b1111 else row
+        for row in results
+    ]
+
+
+def _split_groups(
+    results: list, limit: Optional[int], max_points: Optional[int] = None, period: int = 0
+) -> Tuple[tuple, list, list, list]:
+    """Split one period's GROUPING SETS rows into totals, products, buckets and states.
+    
+    Rows carry ``grouping_id, item_sku, item_name, bucket, state,
+    revenue, order_count, items_sold, avg_order_value, unique_customers,
+    unique_states, avg_lat, avg_lng, period``; period 0 is the requested
+    range and 1 the comparison range. Products come back as the top
+    ``limit`` by revenue, time buckets in order (downsampled to
+    ``max_points``) and states by revenue.
+    """
+    # GROUPING bits are (item_sku, item_name, bucket, state); a set bit
+    # means the column was aggregated away. A period without orders has
+    # no total row.
+    totals = (None,) * 14
+    product_rows, day_rows, state_rows = [], [], []
+    for row in results:
+        if row[13] != period:
+            continue
+        grouping_id = row[0]
+        if grouping_id == 0b1111:
+            totals = row
+        elif grouping_id == 0b0011:
+            product_rows.append(row)
+        elif grouping_id == 0b1101:
+            day_rows.append(row)
+        elif row[4]:
+            state_rows.append(row)
+    
+    product_rows.sort(key=lambda row: row[5], reverse=True)
+    day_rows.sort(key=lambda row: row[3])
+    state_rows.sort(key=lambda row: row[5], reverse=True)
+    day_rows = _downsample(day_rows, max_points, lambda row: (row[3], row[5]))
+    return totals, product_rows[:limit], day_rows, state_rows
+
+
+def _build_sales_metrics(totals: tuple, start_date: datetime, end_date: datetime) -> SalesMetrics:
+    """Build sales metrics from a period total row."""
+    total_revenue = totals[5] or 0
+    sales_metrics = SalesMetrics(
+        total_revenue=Decimal(str(total_revenue)),
+        total_orders=totals[6] or 0,
+        total_items_sold=totals[7] or 0,
+        average_order_value=Decimal(str(totals[8] or 0)),
+        unique_customers=totals[9] or 0,
+        unique_states=totals[10] or 0,
+        date_range={
+            "start": start_date.date(),
+            "end": end_date.date()
+        }
+    )
+    return sales_metrics
+
+
+def _percent_change(current, previous) -> Optional[float]:
+    """Percent change from ``previous``; None when there was nothing before."""
+    if not previous:
+        return None
+    return (float(current) - float(previous)) / float(previous) * 100
+
+
+def _compare_periods(
+    compare: str,
+    sales_metrics: SalesMetrics,
+    previous_sales: SalesMetrics,
+    products: List[Tuple[str, Any]],
+    previous_products: Dict[str, Tuple[Any, int]],
+    states: List[Tuple[str, Any]],
+    previous_states: Dict[str, Tuple[Any, int]],
+) -> PeriodComparison:
+    """Build the comparison for the current top products and states.
+    
+    ``products`` and ``states`` are ``(key, revenue)`` pairs in display
+    order; the previous mappings give ``(revenue, order_count)`` per key.
+    """
+    def compare_items(current, previous) -> List[ItemComparison]:
+        items = []
+        for key, revenue in current:
+            previous_revenue, previous_orders = previous.get(key, (0, 0))
+            items.append(ItemComparison(
+                key=key,
+                previous_revenue=Decimal(str(previous_revenue)),
+                previous_order_count=previous_orders,
+                revenue_change=_percent_change(revenue, previous_revenue)
+            ))
+        return items
+    
+    return PeriodComparison(
+        compare=compare,
+        sales_metrics=previous_sales,
+        changes={
+            field: _percent_change(getattr(sales_metrics, field), getattr(previous_sales, field))
+            for field in SalesMetrics.model_fields if field != "date_range"
+        },
+        top_products=compare_items(products, previous_products),
+        geographic_distribution=compare_items(states, previous_states)
+    )
+
+
+def _compare_groups(
+    results: list,
+    compare: str,
+    previous: Tuple[datetime, datetime],
+    sales_metrics: SalesMetrics,
+    product_rows: list,
+    state_rows: list,
+) -> PeriodComparison:
+    """Build the comparison from the period 1 GROUPING SETS rows."""
+    previous_totals, previous_products, _, previous_states = _split_groups(
+        results, None, period=1
+    )
+    return _compare_periods(
+        compare,
+        sales_metrics,
+        _build_sales_metrics(previous_totals, *previous),
+        [(row[1], row[5]) for row in product_rows],
+        {row[1]: (row[5], row[6]) for row in previous_products},
+        [(row[4], row[5]) for row in state_rows],
+        {row[4]: (row[5], row[6]) for row in previous_states},
+    )
+
+
+def _build_dashboard(
+    results: list,
+    start_date: datetime,
+    end_date: datetime,
+    limit: int = 10,
+    approximate: bool = False,
+    granularity: str = "day",
+    max_points: Optional[int] = None,
+    compare: Optional[str] = None,
+    previous: Optional[Tuple[datetime, datetime]] = None,
+) -> DashboardMetrics:
+    """Assemble dashboard models from GROUPING SETS result rows."""
+    totals, product_rows, day_rows, state_rows = _split_groups(results, limit, max_points)
+    sales_metrics = _build_sales_metrics(totals, start_date, end_date)
+    
+    # Percentages share the one grand total
+    percentage_base = float(sales_metrics.total_revenue or 1)
+    
+    top_products = [
+        ProductMetrics(
+            item_sku=row[1],
+            item_name=row[2],
+            quantity_sold=row[7],
+            revenue=Decimal(str(row[5])),
+            order_count=row[6],
+            percentage_of_total=float(row[5]) / percentage_base * 100
+        )
+        for row in product_rows
+    ]
+    
+    time_series = [
+        TimeSeriesMetric(
+            date=row[3],
+            revenue=Decimal(str(row[5])),
+            order_count=row[6],
+            items_sold=row[7]
+        )
+        for row in day_rows
+    ]
+    
+    geographic_distribution = [
+        GeographicMetric(
+            location=row[4],
+            location_type="state",
+            revenue=Decimal(str(row[5])),
+            order_count=row[6],
+            percentage_of_total=float(row[5]) / percentage_base * 100,
+            latitude=row[11],
+            longitude=row[12]
+        )
+        for row in state_rows
+    ]
+    
+    comparison = None
+    if compare:
+        comparison = _compare_groups(
+            results, compare, previous, sales_metrics, product_rows, state_rows
+        )
+    
+    return DashboardMetrics(
+        sales_metrics=sales_metrics,
+        top_products=top_products,
+        time_series=time_series,
+        geographic_distribution=geographic_distribution,
+        approximate=approximate,
+        granularity=granularity,
+        comparison=comparison
+    )
+
+
+def _build_dashboard_columns(
+    results: list,
+    start_date: datetime,
+    end_date: datetime,
+    limit: int = 10,
+    approximate: bool = False,
+    granularity: str = "day",
+    max_points: Optional[int] = None,
+    compare: Optional[str] = None,
+    previous: Optional[Tuple[datetime, datetime]] = None,
+) -> Dict[str, Any]:
+    """Assemble dashboard sections as parallel arrays from GROUPING SETS rows.
+    
+    Same values as ``_build_dashboard`` but revenue is a JSON number and no
+    model is built per row.
+    """
+    totals, product_rows, day_rows, state_rows = _split_groups(results, limit, max_points)
+    sales_metrics = _build_sales_metrics(totals, start_date, end_date)
+    percentage_base = float(sales_metrics.total_revenue or 1)
+    
+    def column(rows: list, index: int) -> list:
+        return [row[index] for row in rows]
+    
+    def percentages(rows: list) -> List[float]:
+        return [float(row[5]) / percentage_base * 100 for row in rows]
+    
+    comparison = None
+    if compare:
+        comparison = _compare_groups(
+            results, compare, previous, sales_metrics, product_rows, state_rows
+        )
+    
+    return {
+        "sales_metrics": sales_metrics.model_dump(),
+        "top_products": {
+            "item_sku": column(product_rows, 1),
+            "item_name": column(product_rows, 2),
+            "quantity_sold": column(product_rows, 7),
+            "revenue": column(product_rows, 5),
+            "order_count": column(product_rows, 6),
+            "percentage_of_total": percentages(product_rows),
+        },
+        "time_series": {
+            "date": column(day_rows, 3),
+            "revenue": column(day_rows, 5),
+            "order_count": column(day_rows, 6),
+            "items_sold": column(day_rows, 7),
+        },
+        "geographic_distribution": {
+            "location": column(state_rows, 4),
+            "location_type": ["state"] * len(state_rows),
+            "revenue": column(state_rows, 5),
+            "order_count": column(state_rows, 6),
+            "percentage_of_total": percentages(state_rows),
+            "latitude": column(state_rows, 11),
+            "longitude": column(state_rows, 12),
+        },
+        "approximate": approximate,
+        "granularity": granularity,
+        "comparison": _comparison_columns(comparison),
+    }
+
+
+def compute_map_metrics(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    bbox: Tuple[float, float, float, float] = (-90, -180, 90, 180),
+    cell_zoom: Optional[int] = TILE_ZOOM,
+    level: str = "grid",
+) -> MapMetrics:
+    """Aggregate orders with coordinates into cells inside ``bbox``.
+    
+    ``bbox`` is ``(min_lat, min_lng, max_lat, max_lng)``. Full days are read
+    from ``geo_rollup`` and the partial days at either edge aggregated from
+    raw orders, as for the dashboard. The box is matched against the stored
+    tile keys, so it is rounded out to whole ``TILE_ZOOM`` tiles.
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    # Tile rows count down from the north
+    west, south = tile_of(min_lat, min_lng)
+    east, north = tile_of(max_lat, max_lng)
+    if min_lng <= max_lng:
+        tile_filter = "tile_x BETWEEN ? AND ?"
+    else:
+        tile_filter = "(tile_x >= ? OR tile_x <= ?)"
+    tile_filter += " AND tile_y BETWEEN ? AND ?"
+    
+    if level == "zip":
+        keys = "zip_code"
+        tile_filter += " AND zip_code IS NOT NULL"
+    else:
+        shift = TILE_ZOOM - cell_zoom
+        keys = f"tile_x >> {shift}, tile_y >> {shift}"
+    
+    first_day, last_day = _full_day_range(start_date, end_date)
+    edges = ROLLUPS["geo_rollup"][1].format(where="""
+        WHERE order_date >= ? AND order_date <= ?
+        AND (order_day < ? OR order_day >= ?)
+    """)
+    query = f"""
+        WITH facts AS (
+            SELECT tile_x, tile_y, zip_code, revenue, order_count, lat_sum, lng_sum
+            FROM geo_rollup
+            WHERE order_day >= ? AND order_day < ?
+            UNION ALL
+            SELECT tile_x, tile_y, zip_code, revenue, order_count, lat_sum, lng_sum
+            FROM ({edges})
+        )
+        SELECT
+            {keys},
+            SUM(revenue) AS cell_revenue,
+            SUM(order_count) AS cell_orders,
+            SUM(lat_sum) / SUM(order_count) AS avg_lat,
+            SUM(lng_sum) / SUM(order_count) AS avg_lng,
+            SUM(SUM(revenue)) OVER () AS total_revenue,
+            COUNT(*) OVER () AS total_cells
+        FROM facts
+        WHERE {tile_filter}
+        GROUP BY {keys}
+        ORDER BY cell_revenue DESC
+        LIMIT ?
+    """
+    
+    results = conn.execute(query, [
+        first_day, last_day, start_date, end_date, first_day, last_day,
+        west, east, north, south, settings.MAP_MAX_CELLS
+    ]).fetchall()
+    
+    key_count = 1 if level == "zip" else 2
+    total_revenue = results[0][-2] if results else 0
+    percentage_base = float(total_revenue or 1)
+    
+    cells = []
+    for row in results:
+        location = row[0] if level == "zip" else quadkey(row[0], row[1], cell_zoom)
+        revenue, order_count, latitude, longitude = row[key_count:key_count + 4]
+        cells.append(GeographicMetric(
+            location=location,
+            location_type=level,
+            revenue=Decimal(str(revenue)),
+            order_count=order_count,
+            percentage_of_total=float(revenue) / percentage_base * 100,
+            latitude=latitude,
+            longitude=longitude
+        ))
+    
+    return MapMetrics(
+        cells=cells,
+        level=level,
+        cell_zoom=cell_zoom,
+        total_revenue=Decimal(str(total_revenue)),
+        total_cells=results[0][-1] if results else 0
+    )
+
+
+def compute_weekday_hour_heatmap(
+    conn, start_date: datetime, end_date: datetime
+) -> WeekdayHourHeatmap:
+    """Aggregate orders into a 7x24 weekday/hour grid.
+    
+    Full days are read from ``hourly_rollup`` (at most 24 rows each) and the
+    partial days at either edge from raw orders.
+    """
+    first_day, last_day = _full_day_range(start_date, end_date)
+    edges = ROLLUPS["hourly_rollup"][1].format(where="""
+        WHERE order_date >= ? AND order_date <= ?
+        AND (order_day < ? OR order_day >= ?)
+    """)
+    results = conn.execute(f"""
+        SELECT weekday, hour, SUM(revenue), SUM(order_count)
+        FROM (
+            SELECT weekday, hour, revenue, order_count
+            FROM hourly_rollup
+            WHERE order_day >= ? AND order_day < ?
+            UNION ALL
+            SELECT weekday, hour, revenue, order_count
+            FROM ({edges})
+        )
+        GROUP BY weekday, hour
+    """, [first_day, last_day, start_date, end_date, first_day, last_day]).fetchall()
+    
+    order_counts = [[0] * 24 for _ in range(7)]
+    revenue = [[Decimal("0")] * 24 for _ in range(7)]
+    for weekday, hour, hour_revenue, hour_orders in results:
+        revenue[weekday][hour] = Decimal(str(hour_revenue))
+        order_counts[weekday][hour] = hour_orders
+    
+    return WeekdayHourHeatmap(
+        order_counts=order_counts,
+        revenue=revenue,
+        date_range={
+            "start": start_date.date(),
+            "end": end_date.date()
+        }
+    )
+
+
+def _get_total_revenue(conn, start_date: datetime, end_date: datetime) -> float:
+    """Get total revenue in the date range."""
     query = """
+        SELECT SUM(order_total) FROM orders 
+        WHERE order_date >= ? AND order_date <= ?
+    """
+    return conn.execute(query, [start_date, end_date]).fetchone()[0] or 0
+
+
+def _get_sales_metrics(
+    conn, start_date: datetime, end_date: datetime, approximate: bool = False
+) -> SalesMetrics:
+    """Calculate overall sales metrics.
+    
+    ``approximate`` only estimates distinct customers; order_id is the
+    primary key, so orders are always counted exactly.
+    """
+    query = f"""
         SELECT 
             SUM(order_total) as total_revenue,
-            COUNT(DISTINCT order_id) as total_orders,
+            COUNT(*) as total_orders,
             SUM(quantity) as total_items_sold,
             AVG(order_total) as avg_order_value,
-            COUNT(DISTINCT customer_name) as unique_customers,
+            {_count_distinct("customer_name", approximate)} as unique_customers,
             COUNT(DISTINCT state) as unique_states,
             MIN(order_date) as first_order,
             MAX(order_date) as last_order
@@ -87,15 +1068,24 @@ def _get_sales_metrics(conn, start_date: datetime, end_date: datetime) -> SalesM
     )
 
 
-def _get_top_products(conn, start_date: datetime, end_date: datetime, limit: int = 10) -> list[ProductMetrics]:
-    """Get top selling products."""
+def _get_top_products(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    limit: Optional[int] = 10,
+    total_revenue: Optional[Decimal] = None,
+) -> list[ProductMetrics]:
+    """Get top selling products (all of them when ``limit`` is None).
+    
+    Pass ``total_revenue`` when it is already known to skip re-querying it.
+    """
     query = """
         SELECT 
             item_sku,
             item_name,
             SUM(quantity) as quantity_sold,
             SUM(order_total) as revenue,
-            COUNT(DISTINCT order_id) as order_count
+            COUNT(*) as order_count
         FROM orders
         WHERE order_date >= ? AND order_date <= ?
         GROUP BY item_sku, item_name
@@ -106,11 +1096,9 @@ def _get_top_products(conn, start_date: datetime, end_date: datetime, limit: int
     results = conn.execute(query, [start_date, end_date, limit]).fetchall()
     
     # Get total revenue for percentage calculation
-    total_revenue_query = """
-        SELECT SUM(order_total) FROM orders 
-        WHERE order_date >= ? AND order_date <= ?
-    """
-    total_revenue = conn.execute(total_revenue_query, [start_date, end_date]).fetchone()[0] or 1
+    if total_revenue is None:
+        total_revenue = _get_total_revenue(conn, start_date, end_date)
+    total_revenue = total_revenue or 1
     
     products = []
     for row in results:
@@ -126,18 +1114,23 @@ def _get_top_products(conn, start_date: datetime, end_date: datetime, limit: int
     return products
 
 
-def _get_time_series(conn, start_date: datetime, end_date: datetime) -> list[TimeSeriesMetric]:
-    """Get daily time series data."""
-    query = """
+def _get_time_series(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    granularity: str = "day",
+) -> list[TimeSeriesMetric]:
+    """Get time series data bucketed by ``granularity``."""
+    query = f"""
         SELECT 
-            order_day,
-            SUM(order_total) as daily_revenue,
-            COUNT(DISTINCT order_id) as daily_orders,
-            SUM(quantity) as daily_items
+            {TIME_BUCKETS[granularity]} as bucket,
+            SUM(order_total) as bucket_revenue,
+            COUNT(*) as bucket_orders,
+            SUM(quantity) as bucket_items
         FROM orders
         WHERE order_date >= ? AND order_date <= ?
-        GROUP BY order_day
-        ORDER BY order_day
+        GROUP BY bucket
+        ORDER BY bucket
     """
     
     results = conn.execute(query, [start_date, end_date]).fetchall()
@@ -154,13 +1147,21 @@ def _get_time_series(conn, start_date: datetime, end_date: datetime) -> list[Tim
     return time_series
 
 
-def _get_geographic_distribution(conn, start_date: datetime, end_date: datetime) -> list[GeographicMetric]:
-    """Get geographic distribution by state."""
+def _get_geographic_distribution(
+    conn,
+    start_date: datetime,
+    end_date: datetime,
+    total_revenue: Optional[Decimal] = None,
+) -> list[GeographicMetric]:
+    """Get geographic distribution by state.
+    
+    Pass ``total_revenue`` when it is already known to skip re-querying it.
+    """
     query = """
         SELECT 
             state,
             SUM(order_total) as revenue,
-            COUNT(DISTINCT order_id) as order_count,
+            COUNT(*) as order_count,
             AVG(latitude) as avg_lat,
             AVG(longitude) as avg_lng
         FROM orders
@@ -173,11 +1174,9 @@ def _get_geographic_distribution(conn, start_date: datetime, end_date: datetime)
     results = conn.execute(query, [start_date, end_date]).fetchall()
     
     # Get total revenue for percentage
-    total_revenue_query = """
-        SELECT SUM(order_total) FROM orders 
-        WHERE order_date >= ? AND order_date <= ?
-    """
-    total_revenue = conn.execute(total_revenue_query, [start_date, end_date]).fetchone()[0] or 1
+    if total_revenue is None:
+        total_revenue = _get_total_revenue(conn, start_date, end_date)
+    total_revenue = total_revenue or 1
     
     geographic = []
     for row in results:
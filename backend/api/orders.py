@@ -1,17 +1,35 @@
 """Order management endpoints."""
 
-from typing import Optional
-from datetime import datetime
+import base64
+import binascii
+import json
+from typing import Optional, Tuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 
 from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import Response
 
-from core.database import get_connection
+from core.cache import order_count_cache
+from core.columnar import ColumnarResponse, dumps, fetch_columns
+from core.config import settings
+from core.database import get_dataset_version, get_order_count, run_read, to_naive_utc
 from core.security import require_role
-from schemas.orders import OrdersResponse, OrdersFilter
+from schemas.orders import Order, OrdersResponse, OrdersFilter
 
 
 router = APIRouter()
 
+# Order fields in response order. DECIMALs go through DOUBLE to VARCHAR so
+# they read like the default path's Decimals (parsed from pandas floats),
+# and every fetched value is native to orjson.
+ORDER_FIELDS = list(Order.model_fields)
+_FAST_SELECT = ", ".join(
+    f"CAST(CAST({name} AS DOUBLE) AS VARCHAR) AS {name}"
+    if Order.model_fields[name].annotation is Decimal else name
+    for name in ORDER_FIELDS
+)
+
 
 @router.get("", response_model=OrdersResponse)
 async def get_orders(
@@ -23,11 +41,70 @@ async def get_orders(
     max_total: Optional[float] = Query(None),
     limit: int = Query(100, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a page"),
+    count: str = Query("exact", pattern="^(exact|estimate)$"),
+    response_format: str = Query("json", alias="format", pattern="^(json|columnar|fast)$"),
     _: dict = Depends(require_role("viewer"))
 ):
-    """Get filtered orders."""
-    conn = get_connection()
+    """Get filtered orders, newest first.
+    
+    Pages are ordered by ``(order_date, order_id)``. Each response carries
+    opaque ``next_cursor``/``prev_cursor`` values; passing one back as
+    ``cursor`` seeks straight to the adjacent page, so deep pages cost the
+    same as the first. ``offset`` still works but skips rows one by one and
+    is ignored with a cursor. ``format=columnar`` returns ``orders`` as
+    parallel arrays per column, serialized straight from the query result.
+    ``format=fast`` returns the same JSON as the default but encodes the
+    fetched tuples directly, without a DataFrame or per-row validation.
+    
+    The filtered count is computed with the first page of a filter and
+    reused for later pages; ``count=estimate`` returns an estimate from the
+    daily rollup instead when it is not already known. Aware dates are
+    read as UTC.
+    """
+    return await run_read(
+        _query_orders, to_naive_utc(start_date), to_naive_utc(end_date), state, item_sku,
+        min_total, max_total, limit, offset, response_format,
+        _decode_cursor(cursor) if cursor else None, count
+    )
+
+
+def _encode_cursor(direction: str, order_date: datetime, order_id: str) -> str:
+    """Opaque cursor for the page before or after an order."""
+    payload = json.dumps([direction, order_date.isoformat(), order_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, datetime, str]:
+    """Decode a cursor into ``(direction, order_date, order_id)``."""
+    try:
+        direction, order_date, order_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(order_date), str(order_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _query_orders(
+    conn,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+    min_total: Optional[float],
+    max_total: Optional[float],
+    limit: int,
+    offset: int,
+    response_format: str = "json",
+    cursor: Optional[Tuple[str, datetime, str]] = None,
+    count: str = "exact",
+):
+    """Run the filtered orders queries on a private cursor.
     
+    ``cursor`` is a decoded ``(direction, order_date, order_id)`` keyset
+    position; pages are fetched relative to it instead of ``offset``.
+    """
     # Build query
     where_clauses = []
     params = []
@@ -56,29 +133,208 @@ async def get_orders(
         where_clauses.append("order_total <= ?")
         params.append(max_total)
     
-    # Build final query
-    base_query = "SELECT * FROM orders"
-    if where_clauses:
-        base_query += " WHERE " + " AND ".join(where_clauses)
+    where = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
     
-    # Get total count
-    total_count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    # Table size is kept per dataset version
+    total_count = get_order_count(conn)
     
-    # Get filtered count
-    count_query = f"SELECT COUNT(*) FROM ({base_query}) t"
-    filtered_count = conn.execute(count_query, params).fetchone()[0]
+    # Filtered counts are cached per filter; an unknown one is counted by
+    # the page query itself or estimated
+    count_key = ("orders", get_dataset_version(), where, tuple(params))
+    filtered_count = order_count_cache.get(count_key)
+    count_estimated = False
+    if filtered_count is None and count == "estimate":
+        filtered_count = _estimate_count(
+            conn, start_date, end_date, state, item_sku, min_total, max_total
+        )
+        count_estimated = True
     
-    # Get paginated results
-    query = f"{base_query} ORDER BY order_date DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    if filtered_count is None:
+        filtered_query = f"SELECT *, COUNT(*) OVER () AS filtered_count FROM orders{where}"
+    else:
+        filtered_query = f"SELECT * FROM orders{where}"
     
-    result = conn.execute(query, params).fetchdf()
+    # Get paginated results, plus one row to tell whether more follow
+    newest_first = "order_date DESC, order_id DESC"
+    direction = cursor[0] if cursor else None
+    page_params = list(params)
+    if cursor is None:
+        query = f"{filtered_query} ORDER BY {newest_first} LIMIT ? OFFSET ?"
+        page_params.extend([limit + 1, offset])
+    else:
+        # Seek past the cursor row; previous pages are read oldest first
+        # and flipped back
+        _, cursor_date, cursor_id = cursor
+        if direction == "next":
+            seek, order = "<", newest_first
+        else:
+            seek, order = ">", "order_date ASC, order_id ASC"
+        keyset_query = f"""
+            SELECT * FROM ({filtered_query})
+            WHERE order_date {seek} ? OR (order_date = ? AND order_id {seek} ?)
+            ORDER BY {order} LIMIT ?
+        """
+        query = f"SELECT * FROM ({keyset_query}) ORDER BY {newest_first}"
+        page_params.extend([cursor_date, cursor_date, cursor_id, limit + 1])
+    
+    if response_format == "columnar":
+        conn.execute(query, page_params)
+        orders = fetch_columns(conn)
+        row_count = len(orders["order_id"])
+    elif response_format == "fast":
+        window = ", filtered_count" if filtered_count is None else ""
+        orders = conn.execute(f"SELECT {_FAST_SELECT}{window} FROM ({query})", page_params).fetchall()
+        row_count = len(orders)
+    else:
+        orders = conn.execute(query, page_params).fetchdf()
+        row_count = len(orders)
+    
+    if filtered_count is None:
+        if response_format == "fast":
+            # The window count is the column after the order fields
+            window_counts = [row[-1] for row in orders[:1]]
+        else:
+            window_counts = orders.pop("filtered_count")
+        if row_count:
+            filtered_count = int(window_counts[0])
+        else:
+            # A page past the end carries no window count
+            filtered_count = conn.execute(
+                f"SELECT COUNT(*) FROM orders{where}", params
+            ).fetchone()[0]
+        order_count_cache.put(count_key, filtered_count)
+    
+    # The extra row is the one furthest from the cursor
+    has_more = row_count > limit
+    if has_more:
+        page = slice(1, None) if direction == "prev" else slice(0, limit)
+        if response_format == "columnar":
+            orders = {name: values[page] for name, values in orders.items()}
+        elif response_format == "fast":
+            orders = orders[page]
+        else:
+            orders = orders.iloc[page]
+        row_count = limit
+    
+    next_cursor = prev_cursor = None
+    if row_count:
+        if response_format == "columnar":
+            dates, ids = orders["order_date"], orders["order_id"]
+        elif response_format == "fast":
+            date_index, id_index = ORDER_FIELDS.index("order_date"), ORDER_FIELDS.index("order_id")
+            dates = [row[date_index] for row in orders]
+            ids = [row[id_index] for row in orders]
+        else:
+            dates, ids = orders["order_date"].tolist(), orders["order_id"].tolist()
+        if has_more or direction == "prev":
+            next_cursor = _encode_cursor("next", dates[-1], ids[-1])
+        if (has_more and direction == "prev") or direction == "next" or (cursor is None and offset):
+            prev_cursor = _encode_cursor("prev", dates[0], ids[0])
+    
+    if response_format == "columnar":
+        return ColumnarResponse({
+            "orders": orders,
+            "total_count": total_count,
+            "filtered_count": filtered_count,
+            "count_estimated": count_estimated,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        })
+    
+    if response_format == "fast":
+        # zip stops at the order fields, leaving out any window count
+        return Response(content=dumps({
+            "orders": [dict(zip(ORDER_FIELDS, row)) for row in orders],
+            "total_count": total_count,
+            "filtered_count": filtered_count,
+            "count_estimated": count_estimated,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }), media_type="application/json")
     
     # Convert to dict records
-    orders = result.to_dict('records') if not result.empty else []
+    records = orders.to_dict('records') if row_count else []
     
     return OrdersResponse(
-        orders=orders,
+        orders=records,
         total_count=total_count,
-        filtered_count=filtered_count
-    )
\ No newline at end of file
+        filtered_count=filtered_count,
+        count_estimated=count_estimated,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
+
+
+def _estimate_count(
+    conn,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    state: Optional[str],
+    item_sku: Optional[str],
+    min_total: Optional[float],
+    max_total: Optional[float],
+) -> int:
+    """Estimate a filtered order count without scanning orders.
+    
+    Orders per day, state and SKU come from ``daily_rollup``, with the
+    partial days at either end of the range prorated by the share of the
+    day they cover. Order total bounds are applied as the share of the
+    first ``ORDER_COUNT_SAMPLE_ROWS`` orders that fall within them.
+    """
+    where_clauses = []
+    params = []
+    weight = "1.0"
+    weight_params = []
+    day = timedelta(days=1)
+    
+    if start_date:
+        where_clauses.append("order_day >= ?")
+        params.append(start_date.date())
+        weight += " * CASE WHEN order_day = ? THEN ? ELSE 1 END"
+        weight_params.extend([
+            start_date.date(),
+            1 - (start_date - datetime.combine(start_date.date(), time.min)) / day
+        ])
+    
+    if end_date:
+        where_clauses.append("order_day <= ?")
+        params.append(end_date.date())
+        weight += " * CASE WHEN order_day = ? THEN ? ELSE 1 END"
+        weight_params.extend([
+            end_date.date(),
+            (end_date - datetime.combine(end_date.date(), time.min)) / day
+        ])
+    
+    if start_date and end_date and start_date.date() == end_date.date():
+        weight, weight_params = "?", [(end_date - start_date) / day]
+    
+    if state:
+        where_clauses.append("state = ?")
+        params.append(state)
+    
+    if item_sku:
+        where_clauses.append("item_sku = ?")
+        params.append(item_sku)
+    
+    where = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    estimate = conn.execute(
+        f"SELECT SUM(order_count * {weight}) FROM daily_rollup{where}",
+        weight_params + params
+    ).fetchone()[0] or 0
+    
+    total_bounds = []
+    bound_params = []
+    if min_total is not None:
+        total_bounds.append("order_total >= ?")
+        bound_params.append(min_total)
+    if max_total is not None:
+        total_bounds.append("order_total <= ?")
+        bound_params.append(max_total)
+    if total_bounds:
+        selectivity = conn.execute(f"""
+            SELECT AVG(CASE WHEN {" AND ".join(total_bounds)} THEN 1.0 ELSE 0.0 END)
+            FROM (SELECT order_total FROM orders LIMIT ?)
+        """, bound_params + [settings.ORDER_COUNT_SAMPLE_ROWS]).fetchone()[0]
+        estimate *= selectivity or 0
+    
+    return round(estimate)
@@ -1,22 +1,30 @@
 """File upload endpoints."""
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, status
+import os
+import tempfile
+
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, status
 
 from core.config import settings
 from core.security import require_role
-from core.database import clear_orders
-from services.data_processor import data_processor
+from services.ingest_jobs import ingest_jobs
 
 
 router = APIRouter()
 
 
-@router.post("/csv")
+@router.post("/csv", status_code=status.HTTP_202_ACCEPTED)
 async def upload_csv(
     file: UploadFile = File(...),
+    mode: str = Query("replace", pattern="^(replace|append|upsert)$"),
     _: dict = Depends(require_role("admin"))
 ):
-    """Upload and process CSV file."""
+    """Upload a CSV file and queue it for background processing.
+    
+    ``replace`` clears existing orders first, ``append`` only inserts new
+    order_ids, and ``upsert`` also overwrites orders that already exist.
+    Poll ``/jobs/{job_id}`` for progress and the final result.
+    """
     # Validate file extension
     if not file.filename.endswith('.csv'):
         raise HTTPException(
@@ -24,33 +32,44 @@ async def upload_csv(
             detail="Only CSV files are allowed"
         )
     
-    # Check file size
-    contents = await file.read()
-    if len(contents) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size exceeds {settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB limit"
-        )
-    
-    # Clear existing orders
-    clear_orders()
+    # Spool the upload to disk in chunks, checking file size as we go
+    spool = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+    try:
+        with spool:
+            size = 0
+            while chunk := await file.read(settings.UPLOAD_SPOOL_CHUNK_BYTES):
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File size exceeds {settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB limit"
+                    )
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
     
-    # Process CSV
-    result = data_processor.process_csv(contents)
+    # The job deletes the spooled file when it finishes
+    job = ingest_jobs.submit(spool.name, file.filename, mode)
     
-    if not result['success']:
-        # Return a proper error structure
-        error_message = "Failed to process CSV file"
-        if result['errors']:
-            error_message = result['errors'][0] if len(result['errors']) == 1 else "Multiple errors occurred"
-        
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/api/upload/jobs/{job.job_id}",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_upload_job(
+    job_id: str,
+    _: dict = Depends(require_role("admin"))
+):
+    """Get progress and result of a background upload."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=error_message
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload job not found"
         )
     
-    return {
-        "success": True,
-        "rows_processed": result['rows_processed'],
-        "message": f"Successfully processed {result['rows_processed']} orders"
-    }
\ No newline at end of file
+    return job.to_dict()
@@ -0,0 +1,83 @@
+"""In-process cache for computed API responses."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from core.config import settings
+
+
+class ResultCache:
+    """Bounded least-recently-used cache whose entries also expire.
+
+    Callers put the dataset version (see ``core.database``) in their keys,
+    so entries computed before a data change are simply never hit again
+    and age out through LRU eviction or the TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store ``value`` and evict the least recently used overflow."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Cumulative hit/miss/eviction counts and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+# Singleton instance for metrics responses
+metrics_cache = ResultCache(
+    settings.METRICS_CACHE_MAX_ENTRIES, settings.METRICS_CACHE_TTL_SECONDS
+)
+
+# Singleton instance for filtered order counts
+order_count_cache = ResultCache(
+    settings.ORDER_COUNT_CACHE_ENTRIES, settings.METRICS_CACHE_TTL_SECONDS
+)
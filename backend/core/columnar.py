@@ -0,0 +1,51 @@
+"""Columnar (parallel array) JSON responses built straight from query results."""
+
+from decimal import Decimal
+from typing import Any, Dict
+
+import numpy as np
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def _default(value: Any) -> Any:
+    """Serialize values orjson does not handle natively."""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ColumnarResponse(ORJSONResponse):
+    """orjson response that also accepts Decimals and NumPy arrays."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize columnar content with orjson."""
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+def fetch_columns(cursor) -> Dict[str, Any]:
+    """Fetch the pending result of ``cursor`` as a dict of parallel arrays.
+
+    Numeric columns without NULLs stay NumPy arrays, which orjson writes
+    without creating Python objects; other columns become lists with None
+    for NULL. DECIMAL columns arrive as floats.
+    """
+    types = {column[0]: column[1] for column in cursor.description}
+    columns = {}
+    for name, values in cursor.fetchnumpy().items():
+        if values.dtype.kind in "biuf" and not np.ma.is_masked(values):
+            columns[name] = np.ma.getdata(values)
+        elif types[name] == "Date":
+            columns[name] = values.astype("datetime64[D]").tolist()
+        else:
+            columns[name] = values.tolist()
+    return columns
+
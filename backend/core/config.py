@@ -16,6 +16,8 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_PATH: str = "analytics.db"
+    DATABASE_PERSISTENT: bool = False  # Store data in DATABASE_PATH instead of memory
+    DB_QUERY_THREADS: int = 8  # Concurrent endpoint queries, each on its own cursor
     
     # Security
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
@@ -23,11 +25,36 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     
     # File Upload
-    MAX_UPLOAD_SIZE: int = 5 * 1024 * 1024  # 5MB
+    MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024 * 1024  # 10GB, spooled to disk
+    UPLOAD_SPOOL_CHUNK_BYTES: int = 1024 * 1024  # 1MB
     ALLOWED_EXTENSIONS: List[str] = [".csv"]
     
+    # Ingest
+    ADDRESS_CACHE_MAX_ENTRIES: int = 100_000
+    INGEST_WORKERS: int = 0  # Address parsing processes; 0 or 1 parses inline
+    INGEST_BATCH_SIZE: int = 1000  # Distinct addresses per worker batch
+    INGEST_CHUNK_ROWS: int = 100_000  # CSV rows held in memory at once
+    INGEST_ENGINE: str = "pandas"  # "pandas" (chunked) or "duckdb" (native read_csv)
+    INGEST_JOB_WORKERS: int = 1  # Uploads processed concurrently in the background
+    INGEST_JOB_HISTORY: int = 100  # Finished jobs kept for status polling
+    
+    # Metrics
+    METRICS_QUERY_MODE: str = "rollup"  # "rollup" (daily_rollup + raw edges), "single_scan" (raw) or "separate"
+    METRICS_CACHE_MAX_ENTRIES: int = 256  # Cached dashboard responses
+    METRICS_CACHE_TTL_SECONDS: int = 300
+    METRICS_MAX_TIME_SERIES_POINTS: int = 1000  # Downsampling budget when a request sets none
+    MAP_CELL_ZOOM_OFFSET: int = 3  # Map grid cells are tiles this many zoom levels below the view
+    MAP_MAX_CELLS: int = 5000  # Highest-revenue cells returned per map query
+    
+    # Orders
+    ORDER_COUNT_CACHE_ENTRIES: int = 1024  # Filtered counts cached per filter and dataset version
+    ORDER_COUNT_SAMPLE_ROWS: int = 10_000  # Orders read to estimate order_total selectivity
+    
     # Export
     EXPORT_EXPIRY_MINUTES: int = 60
+    EXPORT_BATCH_ROWS: int = 10_000  # Rows fetched from DuckDB at a time
+    EXPORT_CHUNK_BYTES: int = 1024 * 1024  # 1MB, bytes buffered per streamed chunk
+    EXPORT_STREAMS: int = 4  # Concurrent export writers, apart from the query pool
     
     class Config:
         case_sensitive = True
@@ -1,27 +1,290 @@
 """Database configuration and initialization."""
 
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
 import duckdb
 from pathlib import Path
 from core.config import settings
+from core.rollups import create_rollup_tables, clear_rollups, rebuild_rollups
+
 
+# Bump whenever init_db's DDL changes so existing database files are upgraded
+SCHEMA_VERSION = 5
 
 # Global connection
 _conn = None
+_conn_lock = threading.Lock()
+
+# Held by every writer to orders so write transactions never interleave.
+# Readers use their own cursors and are not blocked by it.
+write_lock = threading.RLock()
+
+# Pools that run database work for async endpoints, by name: "db" for
+# queries and "db-write" for writers. Writers get their own thread, since
+# they mostly wait on write_lock and would otherwise hold query threads
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+# Incremented on every change to orders; part of result cache keys
+_dataset_version = 0
+_version_lock = threading.Lock()
+
+# Rows in orders as of a dataset version: (version, count)
+_order_count = (None, 0)
 
 
 def get_connection():
-    """Get database connection."""
+    """Get database connection.
+    
+    With ``DATABASE_PERSISTENT`` the database lives in ``DATABASE_PATH`` and
+    survives restarts; otherwise it is in memory.
+    """
     global _conn
     if _conn is None:
-        _conn = duckdb.connect(":memory:", read_only=False)
+        with _conn_lock:
+            if _conn is None:
+                database = settings.DATABASE_PATH if settings.DATABASE_PERSISTENT else ":memory:"
+                _conn = duckdb.connect(database, read_only=False)
     return _conn
 
 
-def init_db():
-    """Initialize database with tables."""
+def _get_executor(pool: str = "db") -> ThreadPoolExecutor:
+    """Get a database thread pool by name, creating it on first use."""
+    if pool not in _executors:
+        with _conn_lock:
+            if pool not in _executors:
+                workers = {
+                    "db": settings.DB_QUERY_THREADS,
+                    "db-write": 1,
+                    "export": settings.EXPORT_STREAMS,
+                }[pool]
+                _executors[pool] = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix=pool
+                )
+    return _executors[pool]
+
+
+def _run_with_cursor(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Call ``fn(cursor, *args, **kwargs)`` with a private cursor."""
+    cursor = get_connection().cursor()
+    try:
+        return fn(cursor, *args, **kwargs)
+    finally:
+        cursor.close()
+
+
+def _run_write(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Call ``fn`` with a private cursor while holding the write lock."""
+    with write_lock:
+        return _run_with_cursor(fn, *args, **kwargs)
+
+
+async def run_read(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run ``fn(cursor, *args, **kwargs)`` on the query pool.
+    
+    Each call gets its own cursor, so concurrent requests query DuckDB in
+    parallel instead of blocking the event loop on the shared connection.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(_run_with_cursor, fn, *args, **kwargs)
+    )
+
+
+async def run_write(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Like ``run_read``, but serialized with all other writers.
+    
+    Runs on the writer thread, so waiting behind an upload never takes a
+    thread from the query pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor("db-write"), functools.partial(_run_write, fn, *args, **kwargs)
+    )
+
+
+class _ChunkQueue:
+    """Write-only file object that hands its bytes to an event loop in chunks.
+    
+    Writes from a pool thread are buffered up to ``EXPORT_CHUNK_BYTES`` and
+    then put on a small bounded queue, blocking while the reader is behind.
+    Once the reader closes it, the next write raises ``OSError`` to stop the
+    writer; writes from the writer's own cleanup after that are dropped.
+    """
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+        self.closed = False
+        self._stopped = False
+        self._loop = loop
+        self._buffer = bytearray()
+    
+    def write(self, data) -> int:
+        if self.closed:
+            if self._stopped:
+                return len(data)
+            self._stopped = True
+            raise OSError("stream reader went away")
+        self._buffer += data
+        if len(self._buffer) >= settings.EXPORT_CHUNK_BYTES:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def finish(self):
+        """Send what is buffered, then the end-of-stream marker."""
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        self._put(None)
+    
+    def close(self):
+        """Stop accepting writes and unblock a writer waiting on the queue."""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+    
+    def _put(self, chunk: Any):
+        if not self.closed:
+            asyncio.run_coroutine_threadsafe(self.queue.put(chunk), self._loop).result()
+
+
+def _write_stream(cursor, fn: Callable[..., Any], out: _ChunkQueue, *args, **kwargs):
+    """Run a stream writer and always end the stream."""
+    try:
+        fn(cursor, out, *args, **kwargs)
+    finally:
+        out.finish()
+
+
+async def stream_read(fn: Callable[..., Any], *args, **kwargs) -> AsyncIterator[bytes]:
+    """Run ``fn(cursor, out, *args, **kwargs)`` on the export pool and yield
+    what it writes to the file object ``out`` while it is still running.
+    
+    Only a few chunks are held at a time, so a slow client slows ``fn`` down
+    instead of growing memory. The writer waits on the client from its own
+    pool of ``EXPORT_STREAMS`` threads, never from the query pool; further
+    exports queue for a free thread. Errors raised by ``fn`` end the stream
+    with the same exception.
+    """
+    loop = asyncio.get_running_loop()
+    out = _ChunkQueue(loop)
+    task = loop.run_in_executor(
+        _get_executor("export"),
+        functools.partial(_run_with_cursor, _write_stream, fn, out, *args, **kwargs),
+    )
+    try:
+        while (chunk := await out.queue.get()) is not None:
+            yield chunk
+        await task
+    finally:
+        out.close()
+        # A writer stopped by a disconnect fails; nobody awaits that error
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+def close_connection():
+    """Stop the database pools, then checkpoint and close the connection."""
+    global _conn
+    for executor in _executors.values():
+        executor.shutdown(wait=True)
+    _executors.clear()
+    if _conn is not None:
+        checkpoint(_conn)
+        _conn.close()
+        _conn = None
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware datetime to the naive UTC that orders store.
+    
+    Naive values are assumed to be UTC already and returned unchanged.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def get_dataset_version() -> int:
+    """Get the current dataset version."""
+    return _dataset_version
+
+
+def bump_dataset_version() -> int:
+    """Mark the orders data as changed and return the new version.
+    
+    Call after committing any write to orders so cached results computed
+    from the old data stop matching.
+    """
+    global _dataset_version
+    with _version_lock:
+        _dataset_version += 1
+        return _dataset_version
+
+
+def get_order_count(conn=None) -> int:
+    """Get the number of orders.
+    
+    Counted once per dataset version, i.e. after each ingest or clear, and
+    served from memory until the next one.
+    """
+    global _order_count
+    version = _dataset_version
+    counted_version, count = _order_count
+    if counted_version != version:
+        if conn is None:
+            conn = get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        _order_count = (version, count)
+    return count
+
+
+def checkpoint(conn=None):
+    """Flush the write-ahead log into the database file.
+    
+    Keeps the WAL short so reopening a large database does not replay it.
+    No-op for in-memory databases.
+    """
+    if not settings.DATABASE_PERSISTENT:
+        return
+    if conn is None:
+        conn = get_connection()
+    conn.execute("CHECKPOINT")
+
+
+def init_db() -> float:
+    """Initialize database with tables and return the seconds it took.
+    
+    Safe to call on every startup: an existing database file whose schema
+    is already current is opened without running any DDL.
+    """
+    started = time.perf_counter()
     conn = get_connection()
     
-    # Create orders table
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER)")
+    current = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+    if current != SCHEMA_VERSION:
+        _create_schema(conn)
+        # Rollups are derived data; recompute them for upgraded databases
+        rebuild_rollups(conn)
+        conn.execute("DELETE FROM schema_version")
+        conn.execute("INSERT INTO schema_version VALUES (?)", [SCHEMA_VERSION])
+        checkpoint(conn)
+        bump_dataset_version()
+    
+    return time.perf_counter() - started
+
+
+def create_orders_table(conn):
+    """Create the orders table if it is missing."""
     conn.execute("""
         CREATE TABLE IF NOT EXISTS orders (
             order_id VARCHAR PRIMARY KEY,
@@ -44,18 +307,40 @@ def init_db():
             upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+
+
+def _create_schema(conn):
+    """Create or upgrade all tables."""
+    create_orders_table(conn)
+    
+    # No secondary indexes: DuckDB answers range filters from zonemaps, and
+    # ART indexes on these columns would block ON CONFLICT DO UPDATE upserts
+    for index in ("idx_order_date", "idx_state", "idx_zip_code", "idx_item_sku"):
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
     
-    # Create indexes for performance
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_date ON orders(order_date)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_state ON orders(state)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_zip_code ON orders(zip_code)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_item_sku ON orders(item_sku)")
+    # Create parsed address cache
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS address_cache (
+            address_line VARCHAR PRIMARY KEY,
+            street VARCHAR,
+            city VARCHAR,
+            state VARCHAR,
+            zip_code VARCHAR,
+            last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
     
-    conn.commit()
+    # Create pre-aggregated rollups of orders
+    create_rollup_tables(conn)
 
 
-def clear_orders():
-    """Clear all orders from database."""
-    conn = get_connection()
-    conn.execute("DELETE FROM orders")
-    conn.commit()
\ No newline at end of file
+def clear_orders(conn=None):
+    """Clear all orders and their rollups from database."""
+    with write_lock:
+        if conn is None:
+            conn = get_connection()
+        conn.execute("DELETE FROM orders")
+        clear_rollups(conn)
+        conn.commit()
+        checkpoint(conn)
+        bump_dataset_version()
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""Pre-aggregated rollups of the orders table.
+
+Rollups are maintained per ``order_day``. Each write records the days it
+touched in a temporary ``rollup_days`` table on its connection, and
+``refresh_rollups`` re-aggregates only those days before the write commits.
+An append of recent orders therefore re-reads a few days, not the table.
+
+``hourly_rollup`` holds at most 24 rows per day (one per hour of day, with
+the day's weekday) for weekday-by-hour heatmaps.
+
+``geo_rollup`` keys each day's orders by their map tile (see ``core.tiles``)
+and ZIP code, so map queries filter and regroup precomputed keys.
+
+``customer_sketch`` holds a HyperLogLog sketch of customer names per day:
+the maximum rank seen in each register. Sketches for any set of days merge
+by taking the per-register maximum, so distinct customers over a range can
+be estimated without reading raw rows.
+"""
+
+import math
+from typing import Iterable
+
+from core.tiles import TILE_X_SQL, TILE_Y_SQL
+
+
+# HyperLogLog registers per day are 2**HLL_PRECISION (about 1.6% error)
+HLL_PRECISION = 12
+_HLL_RANK_BITS = 64 - HLL_PRECISION
+
+# Rollup table -> (DDL, aggregate SELECT over orders with a {where} slot)
+ROLLUPS = {
+    "daily_rollup": (
+        """
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            order_day DATE,
+            state VARCHAR,
+            item_sku VARCHAR,
+            item_name VARCHAR,
+            revenue DECIMAL(18, 2),
+            quantity BIGINT,
+            order_count BIGINT,
+            lat_sum DOUBLE,
+            lng_sum DOUBLE,
+            geo_count BIGINT
+        )
+        """,
+        """
+        SELECT
+            order_day,
+            state,
+            item_sku,
+            item_name,
+            SUM(order_total),
+            SUM(quantity),
+            COUNT(*),
+            SUM(latitude),
+            SUM(longitude),
+            COUNT(latitude)
+        FROM orders
+        {where}
+        GROUP BY order_day, state, item_sku, item_name
+        """,
+    ),
+    "hourly_rollup": (
+        """
+        CREATE TABLE IF NOT EXISTS hourly_rollup (
+            order_day DATE,
+            weekday INTEGER,
+            hour TINYINT,
+            revenue DECIMAL(18, 2),
+            order_count BIGINT
+        )
+        """,
+        """
+        SELECT
+            order_day,
+            weekday,
+            CAST(hour(order_date) AS TINYINT) AS hour,
+            SUM(order_total) AS revenue,
+            COUNT(*) AS order_count
+        FROM orders
+        {where}
+        GROUP BY order_day, weekday, hour
+        """,
+    ),
+    "geo_rollup": (
+        """
+        CREATE TABLE IF NOT EXISTS geo_rollup (
+            order_day DATE,
+            tile_x INTEGER,
+            tile_y INTEGER,
+            zip_code VARCHAR,
+            revenue DECIMAL(18, 2),
+            order_count BIGINT,
+            lat_sum DOUBLE,
+            lng_sum DOUBLE
+        )
+        """,
+        f"""
+        SELECT
+            order_day,
+            {TILE_X_SQL} AS tile_x,
+            {TILE_Y_SQL} AS tile_y,
+            zip_code,
+            SUM(order_total) AS revenue,
+            COUNT(*) AS order_count,
+            SUM(latitude) AS lat_sum,
+            SUM(longitude) AS lng_sum
+        FROM (SELECT * FROM orders {{where}})
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        GROUP BY order_day, tile_x, tile_y, zip_code
+        """,
+    ),
+    "customer_sketch": (
+        """
+        CREATE TABLE IF NOT EXISTS customer_sketch (
+            order_day DATE,
+            register SMALLINT,
+            rank TINYINT
+        )
+        """,
+        # The top bits of the 64-bit hash pick the register; the rank is the
+        # position of the first set bit in the rest
+        f"""
+        SELECT
+            order_day,
+            CAST(h >> {_HLL_RANK_BITS} AS SMALLINT) AS register,
+            CAST(MAX({_HLL_RANK_BITS + 1} - length(bin(h & {(1 << _HLL_RANK_BITS) - 1})))
+                AS TINYINT) AS rank
+        FROM (SELECT order_day, hash(customer_name) AS h FROM orders {{where}})
+        GROUP BY order_day, register
+        """,
+    ),
+}
+
+
+def create_rollup_tables(conn):
+    """Create any missing rollup tables."""
+    for ddl, _ in ROLLUPS.values():
+        conn.execute(ddl)
+
+
+def clear_rollups(conn):
+    """Empty every rollup table."""
+    for table in ROLLUPS:
+        conn.execute(f"DELETE FROM {table}")
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup from all orders."""
+    for table, (_, select) in ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} {select.format(where='')}")
+
+
+def mark_rollup_days(conn, source: str = "processed_orders", existing: bool = False):
+    """Record the days a pending write to orders will touch.
+
+    ``source`` is the relation about to be written. With ``existing`` the
+    current days of orders it will overwrite are recorded instead, so an
+    upsert that moves an order to another day refreshes both days.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_days (order_day DATE)")
+    if existing:
+        conn.execute(f"""
+            INSERT INTO rollup_days
+            SELECT DISTINCT order_day FROM orders
+            WHERE order_id IN (SELECT order_id FROM {source})
+        """)
+    else:
+        conn.execute(f"INSERT INTO rollup_days SELECT DISTINCT order_day FROM {source}")
+
+
+def refresh_rollups(conn):
+    """Re-aggregate the days recorded by ``mark_rollup_days``.
+
+    Runs on the writer's connection inside its transaction, so readers see
+    orders and rollups change together.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_days (order_day DATE)")
+    days = "SELECT DISTINCT order_day FROM rollup_days"
+    for table, (_, select) in ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table} WHERE order_day IN ({days})")
+        conn.execute(f"""
+            INSERT INTO {table}
+            {select.format(where=f"WHERE order_day IN ({days})")}
+        """)
+    conn.execute("DELETE FROM rollup_days")
+
+
+def estimate_distinct(ranks: Iterable[int]) -> int:
+    """Estimate a distinct count from merged HyperLogLog register ranks.
+
+    ``ranks`` holds the maximum rank of each non-empty register.
+    """
+    registers = 1 << HLL_PRECISION
+    ranks = list(ranks)
+    empty = registers - len(ranks)
+
+    alpha = 0.7213 / (1 + 1.079 / registers)
+    estimate = alpha * registers * registers / (sum(2.0 ** -rank for rank in ranks) + empty)
+
+    # Linear counting is more accurate for small cardinalities
+    if estimate <= 2.5 * registers and empty:
+        estimate = registers * math.log(registers / empty)
+    return round(estimate)
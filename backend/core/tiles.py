@@ -0,0 +1,49 @@
+"""Web Mercator map tiles for bucketing orders into grid cells.
+
+Orders are keyed by the tile containing them at ``TILE_ZOOM``. A cell at
+any coarser zoom ``z`` is the key shifted right by ``TILE_ZOOM - z`` bits
+on both axes, and its quadkey is the usual Bing Maps tile name, so cells
+line up with the tiles a map client requests.
+"""
+
+import math
+from typing import Tuple
+
+
+# Zoom of the stored tile keys (cells of about 600 m at the equator)
+TILE_ZOOM = 16
+
+# Web Mercator cannot represent the poles
+MAX_LATITUDE = 85.05112878
+
+_TILES = 1 << TILE_ZOOM
+
+# SQL for the TILE_ZOOM tile of a row with latitude/longitude columns
+TILE_X_SQL = f"""
+    CAST(least(greatest(floor((longitude + 180) / 360 * {_TILES}), 0), {_TILES - 1}) AS INTEGER)
+"""
+TILE_Y_SQL = f"""
+    CAST(least(greatest(floor(
+        (1 - ln(tan(radians(least(greatest(latitude, -{MAX_LATITUDE}), {MAX_LATITUDE})))
+             + 1 / cos(radians(least(greatest(latitude, -{MAX_LATITUDE}), {MAX_LATITUDE}))))
+         / pi()) / 2 * {_TILES}
+    ), 0), {_TILES - 1}) AS INTEGER)
+"""
+
+
+def tile_of(latitude: float, longitude: float) -> Tuple[int, int]:
+    """Return the ``TILE_ZOOM`` tile containing a point, like ``TILE_X_SQL``/``TILE_Y_SQL``."""
+    latitude = min(max(latitude, -MAX_LATITUDE), MAX_LATITUDE)
+    radians = math.radians(latitude)
+    x = math.floor((longitude + 180) / 360 * _TILES)
+    y = math.floor((1 - math.log(math.tan(radians) + 1 / math.cos(radians)) / math.pi) / 2 * _TILES)
+    return min(max(x, 0), _TILES - 1), min(max(y, 0), _TILES - 1)
+
+
+def quadkey(x: int, y: int, zoom: int) -> str:
+    """Quadkey naming tile ``(x, y)`` at ``zoom``."""
+    digits = []
+    for bit in range(zoom - 1, -1, -1):
+        mask = 1 << bit
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
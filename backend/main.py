@@ -9,14 +9,19 @@ from fastapi.responses import JSONResponse
 
 from api import auth, orders, upload, metrics, export
 from core.config import settings
-from core.database import init_db
+from core.database import init_db, close_connection
+from services.data_processor import shutdown_workers
+from services.ingest_jobs import ingest_jobs
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup."""
-    init_db()
+    """Initialize database on startup and stop ingest workers on shutdown."""
+    app.state.startup_seconds = init_db()
     yield
+    ingest_jobs.shutdown()
+    shutdown_workers()
+    close_connection()
 
 
 app = FastAPI(
@@ -56,6 +61,8 @@ async def health_check():
         "status": "healthy",
         "version": "1.0.0",
         "database": "connected",
+        "database_mode": "persistent" if settings.DATABASE_PERSISTENT else "memory",
+        "startup_seconds": getattr(app.state, "startup_seconds", None),
     }
 
 
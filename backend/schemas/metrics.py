@@ -1,7 +1,7 @@
 """Metrics schemas."""
 
-from datetime import date
-from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Union
 from decimal import Decimal
 
 from pydantic import BaseModel
@@ -30,7 +30,7 @@ class ProductMetrics(BaseModel):
 
 class TimeSeriesMetric(BaseModel):
     """Time series data point."""
-    date: date
+    date: Union[datetime, date]  # Bucket start; a datetime for hourly buckets
     revenue: Decimal
     order_count: int
     items_sold: int
@@ -39,7 +39,7 @@ class TimeSeriesMetric(BaseModel):
 class GeographicMetric(BaseModel):
     """Geographic distribution metric."""
     location: str
-    location_type: str  # "state" or "zip"
+    location_type: str  # "state", "zip" or "grid" (a quadkey)
     revenue: Decimal
     order_count: int
     percentage_of_total: float
@@ -47,9 +47,48 @@ class GeographicMetric(BaseModel):
     longitude: Optional[float] = None
 
 
+class ItemComparison(BaseModel):
+    """Previous-period values for a product or state in the current list."""
+    key: str  # item_sku or state
+    previous_revenue: Decimal
+    previous_order_count: int
+    revenue_change: Optional[float] = None  # Percent; None without previous revenue
+
+
+class PeriodComparison(BaseModel):
+    """Comparison period metrics and changes versus the requested range."""
+    compare: str  # "previous" or "yoy"
+    sales_metrics: SalesMetrics
+    changes: Dict[str, Optional[float]]  # Percent change per sales metric
+    top_products: List[ItemComparison]
+    geographic_distribution: List[ItemComparison]
+
+
 class DashboardMetrics(BaseModel):
     """Complete dashboard metrics response."""
     sales_metrics: SalesMetrics
     top_products: List[ProductMetrics]
     time_series: List[TimeSeriesMetric]
-    geographic_distribution: List[GeographicMetric]
\ No newline at end of file
+    geographic_distribution: List[GeographicMetric]
+    approximate: bool = False  # Distinct counts are HyperLogLog estimates
+    granularity: str = "day"  # Time series bucket: "hour", "day", "week" or "month"
+    comparison: Optional[PeriodComparison] = None
+
+
+class MapMetrics(BaseModel):
+    """Orders aggregated into map cells inside a bounding box."""
+    cells: List[GeographicMetric]
+    level: str  # "grid" or "zip"
+    cell_zoom: Optional[int] = None  # Tile zoom of grid cells (quadkey length)
+    total_revenue: Decimal  # Across every cell in the box
+    total_cells: int  # Cells in the box, including any beyond the returned ones
+
+
+class WeekdayHourHeatmap(BaseModel):
+    """Orders and revenue by weekday and hour of day (UTC).
+    
+    Rows are weekdays, Monday first; columns are hours 0-23.
+    """
+    order_counts: List[List[int]]
+    revenue: List[List[Decimal]]
+    date_range: Dict[str, date]
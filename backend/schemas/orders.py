@@ -55,4 +55,7 @@ class OrdersResponse(BaseModel):
     """Response schema for orders list."""
     orders: List[Order]
     total_count: int
-    filtered_count: int
\ No newline at end of file
+    filtered_count: int
+    count_estimated: bool = False  # filtered_count is an estimate
+    next_cursor: Optional[str] = None  # Pass as ``cursor`` for the following page
+    prev_cursor: Optional[str] = None  # Pass as ``cursor`` for the preceding page
\ No newline at end of file
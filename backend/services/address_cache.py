@@ -0,0 +1,107 @@
+"""Persistent cache of parsed shipping addresses."""
+
+from datetime import datetime, timedelta
+from typing import Dict
+
+import pandas as pd
+
+from core.config import settings
+
+
+ADDRESS_FIELDS = ['street', 'city', 'state', 'zip_code']
+
+
+class AddressCache:
+    """Bounded, least-recently-used cache of parsed addresses.
+
+    Entries live in the ``address_cache`` table so they survive across
+    uploads (and restarts when the database is on disk). Every batch stamps
+    the entries it touches with a strictly increasing ``last_used``, so
+    recency holds between chunks of one upload, which share a transaction
+    and therefore its ``CURRENT_TIMESTAMP``.
+    """
+
+    def __init__(self, max_entries: int = settings.ADDRESS_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._last_stamp = datetime.min
+
+    def _next_stamp(self) -> datetime:
+        """Return a ``last_used`` value later than any given out before."""
+        self._last_stamp = max(datetime.now(), self._last_stamp + timedelta(microseconds=1))
+        return self._last_stamp
+
+    def get_many(self, conn, addresses: pd.Series) -> pd.DataFrame:
+        """Return cached entries for the given distinct addresses.
+
+        The result is indexed by ``address_line``; addresses that are not
+        cached are simply absent.
+        """
+        lookup = pd.DataFrame({'address_line': addresses.astype(str)})
+        conn.register('address_lookup', lookup)
+        try:
+            found = conn.execute("""
+                SELECT address_line, street, city, state, zip_code
+                FROM address_cache
+                WHERE address_line IN (SELECT address_line FROM address_lookup)
+            """).fetchdf()
+
+            # Touch hits so they are evicted last
+            if not found.empty:
+                conn.execute("""
+                    UPDATE address_cache SET last_used = ?
+                    WHERE address_line IN (SELECT address_line FROM address_lookup)
+                """, [self._next_stamp()])
+        finally:
+            conn.unregister('address_lookup')
+
+        self.hits += len(found)
+        self.misses += len(lookup) - len(found)
+
+        return found.set_index('address_line')
+
+    def put_many(self, conn, parsed: pd.DataFrame):
+        """Store newly parsed addresses and evict the oldest overflow."""
+        if parsed.empty:
+            return
+
+        entries = parsed[ADDRESS_FIELDS].rename_axis('address_line').reset_index()
+        conn.register('address_entries', entries)
+        try:
+            conn.execute("""
+                INSERT OR IGNORE INTO address_cache
+                    (address_line, street, city, state, zip_code, last_used)
+                SELECT address_line, street, city, state, zip_code, ?
+                FROM address_entries
+            """, [self._next_stamp()])
+        finally:
+            conn.unregister('address_entries')
+
+        self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop least recently used entries beyond ``max_entries``."""
+        size = conn.execute("SELECT COUNT(*) FROM address_cache").fetchone()[0]
+        overflow = size - self.max_entries
+        if overflow <= 0:
+            return
+
+        conn.execute("""
+            DELETE FROM address_cache
+            WHERE address_line IN (
+                SELECT address_line FROM address_cache
+                ORDER BY last_used, address_line
+                LIMIT ?
+            )
+        """, [overflow])
+        self.evictions += overflow
+
+    def stats(self) -> Dict[str, int]:
+        """Cumulative hit/miss/eviction counts."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,22 +1,113 @@
 """Data processing service for CSV files."""
 
 import io
-from typing import List, Dict, Any, Tuple
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import usaddress
 
-from core.database import get_connection
+from core.config import settings
+from core.database import (
+    get_connection, checkpoint, bump_dataset_version, create_orders_table, write_lock
+)
+from core.rollups import clear_rollups, mark_rollup_days, refresh_rollups
 from schemas.orders import OrderCreate
-from services.zipcode_data import get_coordinates_for_zip
+from services.address_cache import AddressCache, ADDRESS_FIELDS
+from services.zipcode_data import (
+    get_coordinates_for_zip,
+    get_zip_centroids,
+    get_zip_prefix_centroids,
+    lookup_coordinates,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Columns an uploaded CSV must provide
+REQUIRED_COLUMNS = [
+    'order_id', 'order_date', 'customer_name', 'address_line',
+    'item_sku', 'item_name', 'quantity', 'unit_price_usd'
+]
+
+# Columns written to the orders table, in insert order
+ORDER_COLUMNS = [
+    'order_id', 'order_date', 'customer_name', 'address_line',
+    'street', 'city', 'state', 'zip_code', 'latitude', 'longitude',
+    'item_sku', 'item_name', 'quantity', 'unit_price_usd',
+    'order_total', 'order_day', 'weekday'
+]
+
+# order_date formats the DuckDB engine reads besides the ISO 8601 values a
+# TIMESTAMPTZ cast accepts. The pandas engine (format='mixed') reads more.
+DUCKDB_DATE_FORMATS = [
+    '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y/%m/%d',
+    '%m/%d/%Y %I:%M %p', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y',
+]
+
+# order_date as a naive UTC timestamp, NULL when unreadable. Naive values
+# are UTC because ingest cursors run with TimeZone = 'UTC'.
+PARSED_DATE_SQL = f"""timezone('UTC', COALESCE(
+    TRY_CAST(order_date AS TIMESTAMPTZ),
+    CAST(try_strptime(order_date, {DUCKDB_DATE_FORMATS}) AS TIMESTAMPTZ)
+))"""
+
+# Progress callback: (rows_parsed, rows_written, fraction_of_input_read)
+ProgressCallback = Callable[[int, int, float], None]
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds spent in each ingest stage."""
+    
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block under ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+
+
+# Persistent pool for CPU-bound address parsing
+_executor = None
+
+
+def _get_executor():
+    """Get the address parsing worker pool, or None when disabled."""
+    global _executor
+    if _executor is None and settings.INGEST_WORKERS > 1:
+        _executor = ProcessPoolExecutor(max_workers=settings.INGEST_WORKERS)
+    return _executor
+
+
+def shutdown_workers():
+    """Shut down the address parsing worker pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def _parse_address_batch(addresses: List[str]) -> List[Dict[str, str]]:
+    """Parse a batch of addresses inside a worker process."""
+    return [data_processor.parse_address(address) for address in addresses]
 
 
 class DataProcessor:
     """Service for processing order data."""
     
     def __init__(self):
-        pass
+        self.address_cache = AddressCache()
     
     def parse_address(self, address_line: str) -> Dict[str, str]:
         """Parse address into components."""
@@ -78,6 +169,71 @@ class DataProcessor:
                 'zip_code': '',
             }
     
+    def parse_addresses(
+        self,
+        address_line: pd.Series,
+        conn=None,
+        timer: Optional[StageTimer] = None,
+    ) -> pd.DataFrame:
+        """Parse and geocode a column of addresses.
+        
+        ``usaddress`` runs once per distinct value that is not already in the
+        persistent address cache, and coordinates are looked up once per
+        distinct address. The result is aligned with the index of
+        ``address_line``.
+        """
+        if timer is None:
+            timer = StageTimer()
+        
+        with timer.stage('parse'):
+            lookup = self.parse_distinct_addresses(pd.Series(address_line.unique()), conn)
+        
+        with timer.stage('enrich'):
+            latitudes, longitudes = lookup_coordinates(lookup['zip_code'])
+            lookup = lookup.assign(latitude=latitudes, longitude=longitudes)
+            
+            addresses = lookup.reindex(address_line)
+            addresses.index = address_line.index
+        return addresses
+    
+    def parse_distinct_addresses(self, distinct: pd.Series, conn=None) -> pd.DataFrame:
+        """Parse distinct addresses through the persistent address cache.
+        
+        Returns a frame of ``ADDRESS_FIELDS`` indexed by ``address_line``.
+        """
+        if conn is None:
+            conn = get_connection()
+        
+        cached = self.address_cache.get_many(conn, distinct)
+        missing = distinct[~distinct.isin(cached.index)].tolist()
+        
+        parsed = pd.DataFrame(
+            self._parse_address_list(missing),
+            index=pd.Index(missing, name='address_line'),
+            columns=ADDRESS_FIELDS,
+        )
+        self.address_cache.put_many(conn, parsed)
+        
+        return pd.concat([cached, parsed])
+    
+    def _parse_address_list(self, addresses: List[str]) -> List[Dict[str, str]]:
+        """Parse addresses, sharding large lists across the worker pool."""
+        batch_size = settings.INGEST_BATCH_SIZE
+        executor = _get_executor()
+        if executor is None or len(addresses) <= batch_size:
+            return [self.parse_address(address) for address in addresses]
+        
+        batches = [
+            addresses[i:i + batch_size]
+            for i in range(0, len(addresses), batch_size)
+        ]
+        
+        # executor.map yields batch results in submission order
+        parsed = []
+        for batch_result in executor.map(_parse_address_batch, batches):
+            parsed.extend(batch_result)
+        return parsed
+    
     def enrich_with_coordinates(self, zip_code: str) -> Tuple[float, float]:
         """Get latitude and longitude for ZIP code."""
         lat, lng = get_coordinates_for_zip(zip_code)
@@ -85,15 +241,10 @@ class DataProcessor:
     
     def validate_csv_schema(self, df: pd.DataFrame) -> List[str]:
         """Validate CSV schema and return errors."""
-        required_columns = [
-            'order_id', 'order_date', 'customer_name', 'address_line',
-            'item_sku', 'item_name', 'quantity', 'unit_price_usd'
-        ]
-        
         errors = []
         
         # Check for required columns
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
         if missing_columns:
             errors.append(f"Missing required columns: {', '.join(missing_columns)}")
         
@@ -116,133 +267,521 @@ class DataProcessor:
         
         if 'order_date' in df.columns:
             try:
-                pd.to_datetime(df['order_date'])
+                pd.to_datetime(df['order_date'], utc=True, format='mixed')
             except Exception:
                 errors.append("Invalid date format in order_date column")
         
         return errors
     
-    def process_csv(self, file_content: bytes) -> Dict[str, Any]:
-        """Process CSV file and return results."""
+    def process_csv(
+        self,
+        file_content: bytes,
+        mode: str = "replace",
+        progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Process CSV file contents and return results."""
+        with write_lock:
+            return self._process_csv_source(
+                io.BytesIO(file_content), len(file_content), mode, progress
+            )
+    
+    def process_csv_file(
+        self,
+        path: str,
+        mode: str = "replace",
+        progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Process a CSV file on disk with the configured ingest engine.
+        
+        ``replace`` clears existing orders first, ``append`` only inserts new
+        order_ids, and ``upsert`` also overwrites orders that already exist.
+        ``progress`` is called as chunks are parsed and written. Uploads
+        hold the database write lock, so they run one at a time while
+        reads continue against the last committed data.
+        """
+        with write_lock:
+            if settings.INGEST_ENGINE == "duckdb":
+                return self._process_csv_duckdb(path, mode, progress)
+            with open(path, 'rb') as source:
+                return self._process_csv_source(
+                    source, os.path.getsize(path), mode, progress
+                )
+    
+    def _begin_ingest(self, mode: str):
+        """Open a private cursor for an ingest and start its transaction."""
+        conn = get_connection().cursor()
+        # Read naive order dates as UTC, like the pandas engine, whatever
+        # the host's zone
+        conn.execute("SET TimeZone = 'UTC'")
+        conn.begin()
+        if mode == "replace":
+            # DuckDB rejects (or silently drops) re-inserting a key deleted
+            # earlier in the same transaction, so swap in an empty table
+            # instead of deleting; a rollback restores the old one
+            conn.execute("ALTER TABLE orders RENAME TO replaced_orders")
+            create_orders_table(conn)
+            clear_rollups(conn)
+        return conn
+    
+    def _commit_ingest(self, conn, mode: str):
+        """Commit an ingest started by ``_begin_ingest``."""
+        if mode == "replace":
+            conn.execute("DROP TABLE replaced_orders")
+        conn.commit()
+        checkpoint(conn)
+        bump_dataset_version()
+    
+    def _process_csv_source(
+        self,
+        source,
+        total_bytes: int,
+        mode: str = "replace",
+        progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Read, validate, transform and insert a CSV one chunk at a time.
+        
+        Only ``INGEST_CHUNK_ROWS`` rows are held in memory at once. The whole
+        upload, including the clear in ``replace`` mode, runs in a single
+        transaction on a private cursor, so a chunk that fails validation
+        leaves the table untouched and readers never see a half-loaded file.
+        """
+        conn = self._begin_ingest(mode)
+        timer = StageTimer()
         try:
             # Read CSV with proper handling of quoted fields
-            df = pd.read_csv(io.BytesIO(file_content), quotechar='"', skipinitialspace=True)
+            reader = pd.read_csv(
+                source,
+                quotechar='"',
+                skipinitialspace=True,
+                chunksize=settings.INGEST_CHUNK_ROWS,
+            )
+            
+            cache_stats = self.address_cache.stats()
+            counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+            rows_read = 0
+            failed_count = 0
+            failed_details = []
+            
+            while True:
+                with timer.stage('read'):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    break
+                
+                if rows_read == 0:
+                    # Log for debugging
+                    print(f"Columns: {chunk.columns.tolist()}")
+                rows_read += len(chunk)
+                
+                # Validate schema
+                with timer.stage('validate'):
+                    errors = self.validate_csv_schema(chunk)
+                if errors:
+                    conn.rollback()
+                    return {
+                        'success': False,
+                        'errors': errors,
+                        'rows_processed': 0,
+                    }
+                
+                # Clean data; for upserts the last row per order_id wins
+                with timer.stage('validate'):
+                    deduped = chunk.drop_duplicates(
+                        subset=['order_id'],
+                        keep='last' if mode == "upsert" else 'first',
+                    )
+                    counts['skipped'] += len(chunk) - len(deduped)
+                    chunk = deduped.dropna(subset=['order_id', 'order_date', 'customer_name', 'address_line'])
+                
+                # Transform the whole chunk at once
+                processed, failed = self.transform_orders(chunk, conn, timer)
+                
+                # Insert into database
+                if not processed.empty:
+                    with timer.stage('insert'):
+                        for key, value in self._insert_orders(processed, mode, conn).items():
+                            counts[key] += value
+                
+                if progress:
+                    progress(
+                        rows_read,
+                        counts['inserted'] + counts['updated'],
+                        source.tell() / total_bytes if total_bytes else 1.0,
+                    )
+                
+                failed_count += len(failed)
+                failed_details.extend(
+                    (fail.row, fail.order_id, fail.error)
+                    for fail in failed.head(5).itertuples()
+                )
+            
+            with timer.stage('rollup'):
+                refresh_rollups(conn)
+            
+            with timer.stage('insert'):
+                self._commit_ingest(conn, mode)
             
             # Log for debugging
-            print(f"CSV loaded with {len(df)} rows")
-            print(f"Columns: {df.columns.tolist()}")
+            print(f"CSV loaded with {rows_read} rows")
+            
+            return self._build_result(counts, failed_count, failed_details, cache_stats, timer)
+            
+        except Exception as e:
+            conn.rollback()
+            print(f"CSV processing error: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                'success': False,
+                'errors': [f"CSV processing failed: {str(e)}"],
+                'rows_processed': 0,
+            }
+        finally:
+            conn.close()
+    
+    def _process_csv_duckdb(
+        self,
+        path: str,
+        mode: str = "replace",
+        progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Load a CSV with DuckDB's native reader and derive columns in SQL.
+        
+        The file is read into a staging table; validation, de-duplication,
+        derived columns and the ZIP join all run in DuckDB. Only the distinct
+        address strings are pulled back into Python for parsing.
+        """
+        conn = self._begin_ingest(mode)
+        timer = StageTimer()
+        try:
+            with timer.stage('read'):
+                conn.execute("""
+                    CREATE OR REPLACE TEMP TABLE staging_orders AS
+                    SELECT *, row_number() OVER () AS csv_row
+                    FROM read_csv(?, header = true, all_varchar = true, quote = '"')
+                """, [path])
+            
+            if progress:
+                staged = conn.execute("SELECT COUNT(*) FROM staging_orders").fetchone()[0]
+                progress(staged, 0, 0.5)
             
             # Validate schema
-            errors = self.validate_csv_schema(df)
+            with timer.stage('validate'):
+                errors = self._validate_staging_orders(conn)
             if errors:
+                conn.rollback()
                 return {
                     'success': False,
                     'errors': errors,
                     'rows_processed': 0,
                 }
             
-            # Clean data
-            df = df.drop_duplicates(subset=['order_id'])
-            df = df.dropna(subset=['order_id', 'order_date', 'customer_name', 'address_line'])
+            # Clean data: keep one row per order_id (the last one for upserts),
+            # then drop incomplete rows
+            with timer.stage('validate'):
+                row_order = "csv_row DESC" if mode == "upsert" else "csv_row"
+                conn.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE clean_orders AS
+                    SELECT *,
+                        {PARSED_DATE_SQL} AS parsed_date,
+                        TRY_CAST(quantity AS DOUBLE) AS parsed_quantity,
+                        TRY_CAST(unit_price_usd AS DOUBLE) AS parsed_price
+                    FROM (
+                        SELECT * FROM staging_orders
+                        QUALIFY row_number() OVER (PARTITION BY order_id ORDER BY {row_order}) = 1
+                    )
+                    WHERE order_id IS NOT NULL AND order_date IS NOT NULL
+                    AND customer_name IS NOT NULL AND address_line IS NOT NULL
+                """)
+                counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+                counts['skipped'] = conn.execute("""
+                    SELECT COUNT(order_id) - COUNT(DISTINCT order_id) FROM staging_orders
+                """).fetchone()[0]
+            
+            # Parse each distinct address once in Python
+            cache_stats = self.address_cache.stats()
+            with timer.stage('parse'):
+                distinct = conn.execute(
+                    "SELECT DISTINCT address_line FROM clean_orders"
+                ).fetchdf()['address_line']
+                parsed_addresses = self.parse_distinct_addresses(distinct, conn).reset_index()
             
-            # Process each row
-            processed_rows = []
-            failed_rows = []
+            with timer.stage('enrich'):
+                zip_centroids = get_zip_centroids()
+                zip_prefix_centroids = get_zip_prefix_centroids()
             
-            for idx, row in df.iterrows():
+                conn.register('parsed_addresses', parsed_addresses)
+                conn.register('zip_centroids', zip_centroids)
+                conn.register('zip_prefix_centroids', zip_prefix_centroids)
                 try:
-                    # Parse address
-                    address_parts = self.parse_address(row['address_line'])
-                    
-                    # Get coordinates
-                    lat, lng = self.enrich_with_coordinates(address_parts['zip_code'])
-                    
-                    # Calculate derived fields
-                    order_date = pd.to_datetime(row['order_date'])
-                    order_total = float(row['quantity']) * float(row['unit_price_usd'])
-                    
-                    processed_row = {
-                        'order_id': str(row['order_id']),
-                        'order_date': order_date,
-                        'customer_name': row['customer_name'],
-                        'address_line': row['address_line'],
-                        'street': address_parts['street'],
-                        'city': address_parts['city'],
-                        'state': address_parts['state'],
-                        'zip_code': address_parts['zip_code'],
-                        'latitude': lat,
-                        'longitude': lng,
-                        'item_sku': row['item_sku'],
-                        'item_name': row['item_name'],
-                        'quantity': int(row['quantity']),
-                        'unit_price_usd': float(row['unit_price_usd']),
-                        'order_total': order_total,
-                        'order_day': order_date.date(),
-                        'weekday': order_date.weekday(),
-                    }
-                    
-                    processed_rows.append(processed_row)
-                except Exception as row_error:
-                    failed_rows.append({
-                        'row': idx + 2,  # +2 for header and 0-based index
-                        'order_id': row.get('order_id', 'unknown'),
-                        'error': str(row_error)
-                    })
-                    print(f"Error processing row {idx}: {row_error}")
+                    conn.execute("""
+                        CREATE OR REPLACE TEMP TABLE processed_orders AS
+                        SELECT
+                            o.order_id,
+                            o.parsed_date AS order_date,
+                            o.customer_name,
+                            o.address_line,
+                            a.street,
+                            a.city,
+                            a.state,
+                            a.zip_code,
+                            COALESCE(z.latitude, zp.latitude) AS latitude,
+                            COALESCE(z.longitude, zp.longitude) AS longitude,
+                            o.item_sku,
+                            o.item_name,
+                            CAST(trunc(o.parsed_quantity) AS INTEGER) AS quantity,
+                            o.parsed_price AS unit_price_usd,
+                            o.parsed_quantity * o.parsed_price AS order_total,
+                            CAST(o.parsed_date AS DATE) AS order_day,
+                            isodow(o.parsed_date) - 1 AS weekday
+                        FROM clean_orders o
+                        LEFT JOIN parsed_addresses a ON a.address_line = o.address_line
+                        LEFT JOIN zip_centroids z ON z.zip_code = left(a.zip_code, 5)
+                        LEFT JOIN zip_prefix_centroids zp
+                            ON regexp_full_match(left(a.zip_code, 5), '[0-9]{5}')
+                            AND zp.zip_prefix = left(a.zip_code, 3)
+                        WHERE o.parsed_date IS NOT NULL
+                        AND o.parsed_quantity IS NOT NULL
+                        AND o.parsed_price IS NOT NULL
+                    """)
+                finally:
+                    conn.unregister('parsed_addresses')
+                    conn.unregister('zip_centroids')
+                    conn.unregister('zip_prefix_centroids')
             
             # Insert into database
-            if processed_rows:
-                self._insert_orders(processed_rows)
-            
-            # Return results with details about failures
-            result = {
-                'success': len(processed_rows) > 0,
-                'rows_processed': len(processed_rows),
-                'errors': [],
-            }
+            with timer.stage('insert'):
+                row_count = conn.execute("SELECT COUNT(*) FROM processed_orders").fetchone()[0]
+                for key, value in self._write_processed_orders(conn, row_count, mode).items():
+                    counts[key] += value
+            
+            failed = conn.execute("""
+                SELECT csv_row + 1 AS row, order_id,
+                    CASE
+                        WHEN parsed_date IS NULL THEN 'Invalid order_date'
+                        WHEN parsed_quantity IS NULL THEN 'Invalid quantity'
+                        ELSE 'Invalid unit_price_usd'
+                    END AS error
+                FROM clean_orders
+                WHERE parsed_date IS NULL OR parsed_quantity IS NULL OR parsed_price IS NULL
+                ORDER BY csv_row
+            """).fetchall()
+            
+            conn.execute("DROP TABLE staging_orders")
+            conn.execute("DROP TABLE clean_orders")
+            conn.execute("DROP TABLE processed_orders")
+            with timer.stage('rollup'):
+                refresh_rollups(conn)
             
-            if failed_rows:
-                result['errors'].append(f"Failed to process {len(failed_rows)} rows")
-                if len(failed_rows) <= 5:
-                    for fail in failed_rows:
-                        result['errors'].append(f"Row {fail['row']} (Order {fail['order_id']}): {fail['error']}")
+            with timer.stage('insert'):
+                self._commit_ingest(conn, mode)
             
-            return result
+            if progress:
+                progress(staged, counts['inserted'] + counts['updated'], 1.0)
+            
+            return self._build_result(counts, len(failed), failed[:5], cache_stats, timer)
             
         except Exception as e:
-            print(f"CSV processing error: {e}")
-            import traceback
-            traceback.print_exc()
+            conn.rollback()
+            logger.exception("DuckDB CSV ingest failed")
             return {
                 'success': False,
                 'errors': [f"CSV processing failed: {str(e)}"],
                 'rows_processed': 0,
             }
+        finally:
+            conn.close()
     
-    def _insert_orders(self, orders: List[Dict[str, Any]]):
-        """Insert orders into database."""
-        conn = get_connection()
+    def _build_result(
+        self,
+        counts: Dict[str, int],
+        failed_count: int,
+        failed_details: List[Tuple[int, str, str]],
+        cache_stats: Dict[str, int],
+        timer: StageTimer,
+    ) -> Dict[str, Any]:
+        """Build the processing result with details about failures.
         
-        # Convert to DataFrame for bulk insert
-        df = pd.DataFrame(orders)
+        A file succeeds when it has at least one valid row, even if an
+        append or upsert finds every row already stored.
+        """
+        rows_processed = counts['inserted'] + counts['updated']
+        result = {
+            'success': rows_processed + counts['skipped'] > 0,
+            'rows_processed': rows_processed,
+            **counts,
+            'errors': [],
+            'address_cache': {
+                'hits': self.address_cache.hits - cache_stats['hits'],
+                'misses': self.address_cache.misses - cache_stats['misses'],
+            },
+            'timings': dict(timer.seconds),
+        }
         
-        # Specify columns explicitly to avoid mismatch
-        columns = [
-            'order_id', 'order_date', 'customer_name', 'address_line',
-            'street', 'city', 'state', 'zip_code', 'latitude', 'longitude',
-            'item_sku', 'item_name', 'quantity', 'unit_price_usd',
-            'order_total', 'order_day', 'weekday'
-        ]
+        if failed_count:
+            result['errors'].append(f"Failed to process {failed_count} rows")
+            if failed_count <= 5:
+                for row, order_id, error in failed_details:
+                    result['errors'].append(f"Row {row} (Order {order_id}): {error}")
+        
+        return result
+    
+    def _validate_staging_orders(self, conn) -> List[str]:
+        """Validate the staged CSV with SQL, mirroring ``validate_csv_schema``."""
+        columns = {
+            row[0] for row in
+            conn.execute("SELECT column_name FROM (DESCRIBE staging_orders)").fetchall()
+        }
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing_columns:
+            return [f"Missing required columns: {', '.join(missing_columns)}"]
+        
+        invalid_quantity, invalid_price, invalid_date = conn.execute(f"""
+            SELECT
+                COUNT(*) FILTER (WHERE TRY_CAST(quantity AS DOUBLE) IS NULL),
+                COUNT(*) FILTER (WHERE TRY_CAST(unit_price_usd AS DOUBLE) IS NULL),
+                COUNT(*) FILTER (
+                    WHERE order_date IS NOT NULL
+                    AND {PARSED_DATE_SQL} IS NULL
+                )
+            FROM staging_orders
+        """).fetchone()
+        
+        errors = []
+        if invalid_quantity:
+            errors.append("Invalid quantity values found")
+        if invalid_price:
+            errors.append("Invalid unit_price_usd values found")
+        if invalid_date:
+            errors.append("Invalid date format in order_date column")
+        return errors
+    
+    def transform_orders(
+        self,
+        df: pd.DataFrame,
+        conn=None,
+        timer: Optional[StageTimer] = None,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Derive order columns for a whole frame.
+        
+        Returns the rows ready for insertion (in ``ORDER_COLUMNS`` order) and
+        a frame describing the rows that failed, with ``row``, ``order_id``
+        and ``error`` columns. Time spent is recorded on ``timer`` when given.
+        """
+        if timer is None:
+            timer = StageTimer()
+        
+        with timer.stage('validate'):
+            order_date = pd.to_datetime(df['order_date'], errors='coerce', utc=True, format='mixed')
+            order_date = order_date.dt.tz_localize(None)
+            quantity = pd.to_numeric(df['quantity'], errors='coerce')
+            unit_price = pd.to_numeric(df['unit_price_usd'], errors='coerce')
+        
+            # Rows that cannot be converted are reported instead of inserted
+            bad_date = order_date.isna()
+            bad_quantity = quantity.isna()
+            bad_price = unit_price.isna()
+            failed_mask = bad_date | bad_quantity | bad_price
         
+            failed = pd.DataFrame({
+                'row': df.index[failed_mask.to_numpy()] + 2,  # +2 for header and 0-based index
+                'order_id': df.loc[failed_mask, 'order_id'].astype(str).to_numpy(),
+                'error': np.select(
+                    [bad_date[failed_mask], bad_quantity[failed_mask]],
+                    ["Invalid order_date", "Invalid quantity"],
+                    default="Invalid unit_price_usd",
+                ),
+            })
+        
+            valid = ~failed_mask
+            df = df[valid]
+            order_date = order_date[valid]
+            quantity = quantity[valid]
+            unit_price = unit_price[valid]
+        
+        # Parse addresses and look up coordinates
+        address_line = df['address_line'].astype(str)
+        addresses = self.parse_addresses(address_line, conn, timer)
+        
+        with timer.stage('enrich'):
+            processed = pd.DataFrame({
+                'order_id': df['order_id'].astype(str),
+                'order_date': order_date,
+                'customer_name': df['customer_name'],
+                'address_line': address_line,
+                'street': addresses['street'],
+                'city': addresses['city'],
+                'state': addresses['state'],
+                'zip_code': addresses['zip_code'],
+                'latitude': addresses['latitude'].astype('float64'),
+                'longitude': addresses['longitude'].astype('float64'),
+                'item_sku': df['item_sku'],
+                'item_name': df['item_name'],
+                'quantity': quantity.astype('int64'),
+                'unit_price_usd': unit_price.astype('float64'),
+                'order_total': quantity * unit_price,
+                'order_day': order_date.dt.normalize(),
+                'weekday': order_date.dt.weekday,
+            }, columns=ORDER_COLUMNS)
+        
+        return processed, failed
+    
+    def _insert_orders(self, orders: pd.DataFrame, mode: str = "replace", conn=None) -> Dict[str, int]:
+        """Write a frame of processed orders and return inserted/updated/skipped counts.
+        
+        Rollups for the touched days are refreshed right away when no
+        ingest connection is given; ingests refresh them once before
+        committing instead.
+        """
+        standalone = conn is None
+        if standalone:
+            conn = get_connection()
+        
+        # Insert into DuckDB straight from the frame
+        conn.register('processed_orders', orders)
+        try:
+            counts = self._write_processed_orders(conn, len(orders), mode)
+        finally:
+            conn.unregister('processed_orders')
+        
+        if standalone:
+            refresh_rollups(conn)
+            bump_dataset_version()
+        return counts
+    
+    def _write_processed_orders(self, conn, row_count: int, mode: str) -> Dict[str, int]:
+        """Write the ``processed_orders`` relation into the orders table.
+        
+        Existing order_ids (from earlier uploads or earlier chunks) are
+        skipped, or overwritten when ``mode`` is ``upsert``. The caller owns
+        the surrounding transaction and calls ``refresh_rollups`` before
+        committing it.
+        """
         # Create column list for SQL
-        column_list = ', '.join(columns)
+        column_list = ', '.join(ORDER_COLUMNS)
         
-        # Insert into DuckDB with explicit columns
-        conn.execute(f"""
-            INSERT INTO orders ({column_list})
-            SELECT {column_list} FROM df
-        """)
-        conn.commit()
+        mark_rollup_days(conn)
+        if mode == "upsert":
+            mark_rollup_days(conn, existing=True)
+            existing = conn.execute("""
+                SELECT COUNT(*) FROM orders
+                WHERE order_id IN (SELECT order_id FROM processed_orders)
+            """).fetchone()[0]
+            assignments = ', '.join(f"{col} = excluded.{col}" for col in ORDER_COLUMNS[1:])
+            conn.execute(f"""
+                INSERT INTO orders ({column_list})
+                SELECT {column_list} FROM processed_orders
+                ON CONFLICT (order_id) DO UPDATE SET
+                    {assignments},
+                    upload_timestamp = now()
+            """)
+            return {'inserted': row_count - existing, 'updated': existing, 'skipped': 0}
+        
+        inserted = conn.execute(f"""
+            INSERT OR IGNORE INTO orders ({column_list})
+            SELECT {column_list} FROM processed_orders
+        """).fetchone()[0]
+        return {'inserted': inserted, 'updated': 0, 'skipped': row_count - inserted}
 
 
 # Singleton instance
@@ -0,0 +1,45 @@
+"""Shape-preserving downsampling of time series."""
+
+from typing import List, Sequence
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Pick at most ``threshold`` point indices with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are
+    split into ``threshold - 2`` buckets and from each the point forming
+    the largest triangle with the previously kept point and the average of
+    the next bucket is kept, so peaks and dips survive. ``xs`` must be
+    ascending. Series already within the budget are returned unchanged.
+    """
+    count = len(xs)
+    if threshold >= count or threshold < 3:
+        return list(range(count))
+
+    selected = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # The third vertex is the average of the following bucket
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs(
+                (xs[previous] - avg_x) * (ys[index] - ys[previous])
+                - (xs[previous] - xs[index]) * (avg_y - ys[previous])
+            )
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+
+    selected.append(count - 1)
+    return selected
@@ -0,0 +1,138 @@
+"""Background CSV ingestion jobs."""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from core.config import settings
+from services.data_processor import data_processor
+
+
+class IngestJob:
+    """State and progress of a single CSV upload."""
+
+    def __init__(self, path: str, filename: str, mode: str):
+        self.job_id = uuid.uuid4().hex
+        self.path = path
+        self.filename = filename
+        self.mode = mode
+        self.status = "queued"
+        self.bytes_total = os.path.getsize(path)
+        self.rows_parsed = 0
+        self.rows_inserted = 0
+        self.fraction_done = 0.0
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def update_progress(self, rows_parsed: int, rows_inserted: int, fraction_done: float):
+        """Record progress reported by the data processor."""
+        self.rows_parsed = rows_parsed
+        self.rows_inserted = rows_inserted
+        self.fraction_done = min(max(fraction_done, 0.0), 1.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize job status, including throughput and ETA."""
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+
+        throughput = self.rows_parsed / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        if self.status == "running" and self.fraction_done > 0:
+            eta_seconds = elapsed * (1 - self.fraction_done) / self.fraction_done
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "filename": self.filename,
+            "mode": self.mode,
+            "bytes_total": self.bytes_total,
+            "rows_parsed": self.rows_parsed,
+            "rows_inserted": self.rows_inserted,
+            "progress": self.fraction_done,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": throughput,
+            "eta_seconds": eta_seconds,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class IngestJobManager:
+    """Runs uploads on a bounded thread pool and tracks their progress."""
+
+    def __init__(self, max_workers: int = settings.INGEST_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, filename: str, mode: str) -> IngestJob:
+        """Queue a spooled CSV file for processing.
+
+        The job owns ``path`` and deletes it once processing finishes.
+        """
+        job = IngestJob(path, filename, mode)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # Forget the oldest finished jobs beyond the history limit;
+            # queued and running jobs are kept wherever they are
+            overflow = len(self._jobs) - settings.INGEST_JOB_HISTORY
+            if overflow > 0:
+                finished = [
+                    job_id for job_id, old in self._jobs.items()
+                    if old.status not in ("queued", "running")
+                ]
+                for job_id in finished[:overflow]:
+                    del self._jobs[job_id]
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Look up a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        """Wait for running jobs and stop the pool."""
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: IngestJob):
+        """Process a job's file on a pool thread."""
+        job.status = "running"
+        job.started_at = datetime.now()
+        try:
+            result = data_processor.process_csv_file(
+                job.path, job.mode, progress=job.update_progress
+            )
+            job.result = result
+            if result['success']:
+                job.status = "succeeded"
+            else:
+                job.status = "failed"
+                job.error = "Failed to process CSV file"
+                if result['errors']:
+                    job.error = result['errors'][0] if len(result['errors']) == 1 else "Multiple errors occurred"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"CSV processing failed: {str(e)}"
+        finally:
+            job.finished_at = datetime.now()
+            if job.status == "succeeded":
+                job.fraction_done = 1.0
+            os.unlink(job.path)
+
+
+# Singleton instance
+ingest_jobs = IngestJobManager()
@@ -1,66 +1,134 @@
-"""Simple ZIP code to coordinates mapping for demo."""
-
-# Sample ZIP code data for major US cities
-ZIP_COORDINATES = {
-    # California
-    "94103": (37.7726, -122.4099),  # San Francisco
-    "90028": (34.1016, -118.3267),  # Los Angeles
-    "92101": (32.7157, -117.1611),  # San Diego
-    "94108": (37.7749, -122.4194),  # San Francisco
-    "90038": (34.0928, -118.3287),  # Los Angeles
-    
-    # New York
-    "10005": (40.7074, -74.0113),   # New York
-    "10010": (40.7389, -73.9876),   # New York
-    "10022": (40.7589, -73.9680),   # New York
-    "10017": (40.7519, -73.9777),   # New York
-    "10170": (40.7527, -73.9772),   # New York
-    
-    # Texas
-    "78701": (30.2672, -97.7431),   # Austin
-    "77002": (29.7604, -95.3698),   # Houston
-    "75201": (32.7767, -96.7970),   # Dallas
-    "75202": (32.7831, -96.8067),   # Dallas
-    
-    # Florida
-    "33139": (25.7817, -80.1309),   # Miami Beach
-    "33140": (25.8103, -80.1269),   # Miami Beach
-    "33132": (25.7739, -80.1973),   # Miami
-    "32801": (28.5383, -81.3792),   # Orlando
-    "32250": (30.2735, -81.4388),   # Jacksonville
-    
-    # Illinois
-    "60601": (41.8781, -87.6298),   # Chicago
-    "60606": (41.8786, -87.6359),   # Chicago
-    "60654": (41.8949, -87.6341),   # Chicago
-    "60611": (41.8969, -87.6235),   # Chicago
-    
-    # Washington
-    "98101": (47.6062, -122.3321),  # Seattle
-    "98104": (47.6038, -122.3262),  # Seattle
-    "98122": (47.6138, -122.3037),  # Seattle
-    
-    # Massachusetts
-    "02110": (42.3601, -71.0589),   # Boston
-    "02109": (42.3663, -71.0544),   # Boston
-    "02210": (42.3467, -71.0392),   # Boston
-    "02116": (42.3496, -71.0764),   # Boston
-    
-    # Colorado
-    "80218": (39.7392, -104.9847),  # Denver
-    "80205": (39.7544, -104.9664),  # Denver
-    "80203": (39.7312, -104.9826),  # Denver
-    "80302": (40.0150, -105.2705),  # Boulder
-    
-    # Georgia
-    "30303": (33.7490, -84.3880),   # Atlanta
-    "30308": (33.7709, -84.3831),   # Atlanta
-    
-    # Arizona
-    "85004": (33.4484, -112.0740),  # Phoenix
-    "85281": (33.4255, -111.9400),  # Tempe
-}
-
-def get_coordinates_for_zip(zip_code: str):
+"""ZIP code to coordinates lookup backed by a bundled centroid index.
+
+The index (built by ``scripts/build_zip_centroids.py``) is a pair of NumPy
+arrays: sorted integer ZIP codes and row-aligned float32 latitude/longitude.
+Both are memory-mapped on first use and searched with ``np.searchsorted``,
+so a batch of millions of ZIPs is resolved in one vectorized call. ZIPs that
+are not in the index fall back to the centroid of their 3-digit prefix.
+"""
+
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# Source coordinates have four decimal places
+COORDINATE_DECIMALS = 4
+
+
+class ZipCentroidIndex:
+    """Memory-mapped ZIP centroid arrays with a ZIP3 prefix fallback."""
+
+    def __init__(self, data_dir: Path = DATA_DIR):
+        self.zip_codes = np.load(data_dir / "zip_codes.npy", mmap_mode="r")
+        coordinates = np.load(data_dir / "zip_coordinates.npy", mmap_mode="r")
+        self.latitudes = coordinates[:, 0]
+        self.longitudes = coordinates[:, 1]
+
+        # Mean centroid per 3-digit prefix, directly indexed by prefix
+        prefixes = self.zip_codes // 100
+        counts = np.bincount(prefixes, minlength=1000)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.prefix_latitudes = np.bincount(prefixes, weights=self.latitudes, minlength=1000) / counts
+            self.prefix_longitudes = np.bincount(prefixes, weights=self.longitudes, minlength=1000) / counts
+
+    def lookup(self, zip_codes: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Resolve ZIP code strings to latitude and longitude arrays.
+
+        Unknown or malformed ZIPs come back as NaN. ZIP+4 codes are matched
+        on their first five digits.
+        """
+        # Parse each distinct string once, then broadcast back to rows
+        row_codes, distinct = pd.factorize(pd.Series(zip_codes, dtype="object"))
+        distinct_latitudes, distinct_longitudes = self._lookup_distinct(pd.Series(distinct))
+
+        latitudes = np.append(distinct_latitudes, np.nan)[row_codes]
+        longitudes = np.append(distinct_longitudes, np.nan)[row_codes]
+        return latitudes, longitudes
+
+    def _lookup_distinct(self, zip_codes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Resolve distinct ZIP code strings; see ``lookup``."""
+        codes = zip_codes.astype(str).str[:5]
+        keys = pd.to_numeric(codes.where(codes.str.fullmatch(r"\d{5}")), errors="coerce")
+
+        latitudes = np.full(len(codes), np.nan)
+        longitudes = np.full(len(codes), np.nan)
+
+        valid = np.flatnonzero(keys.notna().to_numpy())
+        if len(valid) == 0:
+            return latitudes, longitudes
+        key_values = keys.to_numpy()[valid].astype(np.int64)
+
+        # Exact ZIP match by binary search
+        positions = np.searchsorted(self.zip_codes, key_values)
+        positions = np.minimum(positions, len(self.zip_codes) - 1)
+        found = self.zip_codes[positions] == key_values
+        latitudes[valid[found]] = self.latitudes[positions[found]]
+        longitudes[valid[found]] = self.longitudes[positions[found]]
+
+        # ZIP3 prefix fallback for the rest
+        missing = ~found
+        prefixes = key_values[missing] // 100
+        latitudes[valid[missing]] = self.prefix_latitudes[prefixes]
+        longitudes[valid[missing]] = self.prefix_longitudes[prefixes]
+
+        return (
+            latitudes.round(COORDINATE_DECIMALS),
+            longitudes.round(COORDINATE_DECIMALS),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """All indexed ZIP codes as a frame for SQL joins."""
+        return pd.DataFrame({
+            "zip_code": pd.Series(self.zip_codes).astype(str).str.zfill(5),
+            "latitude": np.asarray(self.latitudes, dtype=np.float64).round(COORDINATE_DECIMALS),
+            "longitude": np.asarray(self.longitudes, dtype=np.float64).round(COORDINATE_DECIMALS),
+        })
+
+    def prefix_frame(self) -> pd.DataFrame:
+        """ZIP3 prefix centroids as a frame for SQL joins."""
+        prefixes = np.flatnonzero(~np.isnan(self.prefix_latitudes))
+        return pd.DataFrame({
+            "zip_prefix": pd.Series(prefixes).astype(str).str.zfill(3),
+            "latitude": self.prefix_latitudes[prefixes].round(COORDINATE_DECIMALS),
+            "longitude": self.prefix_longitudes[prefixes].round(COORDINATE_DECIMALS),
+        })
+
+
+# Lazily loaded index
+_index = None
+
+
+def get_zip_index() -> ZipCentroidIndex:
+    """Get the shared ZIP centroid index."""
+    global _index
+    if _index is None:
+        _index = ZipCentroidIndex()
+    return _index
+
+
+def lookup_coordinates(zip_codes: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Get latitude and longitude arrays for a batch of ZIP codes."""
+    return get_zip_index().lookup(zip_codes)
+
+
+def get_coordinates_for_zip(zip_code: str) -> Tuple[Optional[float], Optional[float]]:
     """Get coordinates for a ZIP code."""
-    return ZIP_COORDINATES.get(zip_code, (None, None))
\ No newline at end of file
+    latitudes, longitudes = lookup_coordinates([zip_code])
+    if np.isnan(latitudes[0]):
+        return None, None
+    return float(latitudes[0]), float(longitudes[0])
+
+
+def get_zip_centroids() -> pd.DataFrame:
+    """Get all known ZIP codes as a frame for SQL joins."""
+    return get_zip_index().to_frame()
+
+
+def get_zip_prefix_centroids() -> pd.DataFrame:
+    """Get ZIP3 prefix centroids as a frame for SQL joins."""
+    return get_zip_index().prefix_frame()
@@ -0,0 +1,32 @@
+"""Shared test fixtures."""
+
+import pytest
+
+
+ORDERS_CSV_HEADER = "order_id,order_date,customer_name,address_line,item_sku,item_name,quantity,unit_price_usd\n"
+
+
+@pytest.fixture
+def orders_csv():
+    """Build CSV text with the orders header from the given rows."""
+    return lambda rows: ORDERS_CSV_HEADER + "".join(rows)
+
+
+@pytest.fixture
+def load_orders(orders_csv):
+    """Load the given CSV rows and return the connection.
+    
+    Rows replace all orders unless ``mode`` is ``append`` or ``upsert``.
+    """
+    from core.database import init_db, clear_orders, get_connection
+    from services.data_processor import DataProcessor
+    
+    def load(rows, mode="replace"):
+        init_db()
+        if mode == "replace":
+            clear_orders()
+        result = DataProcessor().process_csv(orders_csv(rows).encode(), mode=mode)
+        assert result["success"], result["errors"]
+        return get_connection()
+    
+    return load
@@ -62,4 +62,707 @@ def test_metrics_with_auth():
     assert "sales_metrics" in data
     assert "top_products" in data
     assert "time_series" in data
-    assert "geographic_distribution" in data
\ No newline at end of file
+    assert "geographic_distribution" in data
+
+def test_upload_job_not_found():
+    """Test polling an unknown upload job."""
+    headers = get_auth_headers("admin")
+    response = client.get("/api/upload/jobs/unknown", headers=headers)
+    assert response.status_code == 404
+
+
+def test_upload_job_runs_in_background(monkeypatch, load_orders, orders_csv):
+    """Test submitting uploads and polling them until they finish."""
+    import os
+    import tempfile
+    import time
+    from core.config import settings
+    from services.ingest_jobs import IngestJob, IngestJobManager
+    
+    conn = load_orders(["9,2023-12-31T08:00:00Z,Zed,\"9 Main St, Austin TX 78701\",S9,Item 9,1,1.0\n"])
+    headers = get_auth_headers("admin")
+    
+    def wait(job_id):
+        for _ in range(200):
+            job = client.get(f"/api/upload/jobs/{job_id}", headers=headers).json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            time.sleep(0.05)
+        raise AssertionError("upload job did not finish")
+    
+    good = orders_csv(["1,2024-01-01T08:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"])
+    response = client.post("/api/upload/csv", files={"file": ("orders.csv", good, "text/csv")}, headers=headers)
+    assert response.status_code == 202
+    job = wait(response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["rows_processed"] == 1
+    assert conn.execute("SELECT order_id FROM orders").fetchall() == [("1",)]
+    
+    bad = "order_id,customer_name\n1,Ann\n"
+    response = client.post("/api/upload/csv", files={"file": ("bad.csv", bad, "text/csv")}, headers=headers)
+    job = wait(response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert "Missing required columns" in job["error"]
+    
+    # A job still running at the front of the history does not pin the
+    # finished jobs behind it
+    def spool():
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(good)
+        return f.name
+    
+    def submit():
+        return manager.submit(spool(), "orders.csv", "append")
+    
+    monkeypatch.setattr(settings, "INGEST_JOB_HISTORY", 2)
+    manager = IngestJobManager()
+    running = IngestJob(spool(), "slow.csv", "append")
+    running.status = "running"
+    manager._jobs[running.job_id] = running
+    os.unlink(running.path)
+    
+    first = submit()
+    while first.status in ("queued", "running"):
+        time.sleep(0.05)
+    second = submit()
+    manager.shutdown()
+    assert manager.get(first.job_id) is None
+    assert manager.get(running.job_id) is running
+    assert manager.get(second.job_id) is second
+
+
+def test_dashboard_single_scan_matches_separate_queries(monkeypatch, load_orders):
+    """Test the single-scan dashboard query against the per-section queries."""
+    from datetime import datetime
+    from api.metrics import compute_dashboard_metrics
+    from core.config import settings
+    
+    conn = load_orders([
+        "1,2024-01-01T10:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n",
+        "2,2024-01-01T12:00:00Z,Bob,\"2 Main St, Denver CO 80218\",S1,Item 1,2,10.0\n",
+        "3,2024-01-02T10:00:00Z,Ann,\"3 Main St, Austin TX 78701\",S2,Item 2,1,5.0\n",
+        "4,2024-01-03T10:00:00Z,Cy,Unknown address,S3,Item 3,4,2.5\n",
+        "5,2024-02-01T10:00:00Z,Di,\"5 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n",
+    ])
+    
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31)
+    results = {}
+    for mode in ("single_scan", "separate"):
+        monkeypatch.setattr(settings, "METRICS_QUERY_MODE", mode)
+        results[mode] = compute_dashboard_metrics(conn, start, end).model_dump()
+    
+    assert results["single_scan"] == results["separate"]
+    assert results["single_scan"]["sales_metrics"]["total_orders"] == 4
+    assert [p["item_sku"] for p in results["single_scan"]["top_products"]] == ["S1", "S3", "S2"]
+    assert [g["location"] for g in results["single_scan"]["geographic_distribution"]] == ["CO", "TX"]
+
+
+def test_dashboard_rollup_planner(monkeypatch, load_orders):
+    """Test rollup-backed dashboard metrics against raw rows, including partial days."""
+    from datetime import datetime
+    from api.metrics import compute_dashboard_metrics
+    from core.config import settings
+    
+    load_orders([
+        "1,2024-01-01T08:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n",
+        "2,2024-01-01T20:00:00Z,Bob,\"2 Main St, Denver CO 80218\",S1,Item 1,2,10.0\n",
+        "3,2024-01-02T10:00:00Z,Ann,\"3 Main St, Austin TX 78701\",S2,Item 2,1,5.0\n",
+        "4,2024-01-03T10:00:00Z,Cy,Unknown address,S3,Item 3,4,2.5\n",
+        "5,2024-01-04T10:00:00Z,Di,\"5 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n",
+    ])
+    # Upserting order 3 onto another day refreshes both days' rollups
+    conn = load_orders(
+        ["3,2024-01-03T12:00:00Z,Ann,\"3 Main St, Austin TX 78701\",S2,Item 2,3,5.0\n"], mode="upsert"
+    )
+    
+    assert conn.execute("SELECT SUM(order_count) FROM daily_rollup").fetchone()[0] == 5
+    assert conn.execute(
+        "SELECT COUNT(*) FROM daily_rollup WHERE order_day = '2024-01-02'"
+    ).fetchone()[0] == 0
+    
+    ranges = [
+        (datetime(2024, 1, 1), datetime(2024, 1, 31)),  # whole days
+        (datetime(2024, 1, 1, 12), datetime(2024, 1, 3, 11)),  # partial edges
+        (datetime(2024, 1, 1, 6), datetime(2024, 1, 1, 9)),  # no full day
+    ]
+    # Exact unique customers are the one rollup-mode figure still counted
+    # from raw orders over the whole range; approximate ones come from
+    # customer_sketch plus the edges
+    for start, end in ranges:
+        results = {}
+        for mode in ("rollup", "single_scan"):
+            monkeypatch.setattr(settings, "METRICS_QUERY_MODE", mode)
+            results[mode] = compute_dashboard_metrics(conn, start, end).model_dump()
+        assert results["rollup"] == results["single_scan"]
+        monkeypatch.setattr(settings, "METRICS_QUERY_MODE", "rollup")
+        approx = compute_dashboard_metrics(conn, start, end, approximate=True)
+        assert approx.sales_metrics.unique_customers == results["rollup"]["sales_metrics"]["unique_customers"]
+
+
+def test_dashboard_cache_invalidated_by_uploads(load_orders):
+    """Test dashboard responses are cached until the dataset changes."""
+    from core.cache import metrics_cache
+    
+    load_orders(["1,2024-01-01T08:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"])
+    metrics_cache.clear()
+    
+    headers = get_auth_headers("viewer")
+    params = {"start_date": "2024-01-01T00:00:00", "end_date": "2024-01-31T00:00:00"}
+    before = metrics_cache.stats()
+    first = client.get("/api/metrics/dashboard", params=params, headers=headers)
+    second = client.get("/api/metrics/dashboard", params=params, headers=headers)
+    assert first.status_code == 200
+    assert first.json() == second.json()
+    assert first.json()["sales_metrics"]["total_orders"] == 1
+    
+    stats = client.get("/api/metrics/cache", headers=get_auth_headers("admin")).json()
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["hits"] == before["hits"] + 1
+    
+    # An upload bumps the dataset version, so the next load recomputes
+    load_orders(["2,2024-01-02T08:00:00Z,Bob,\"2 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"], mode="append")
+    third = client.get("/api/metrics/dashboard", params=params, headers=headers)
+    assert third.json()["sales_metrics"]["total_orders"] == 2
+
+
+def test_dashboard_approximate_distinct(monkeypatch, load_orders):
+    """Test HyperLogLog distinct counts are flagged and close to exact."""
+    from datetime import datetime
+    from api.metrics import compute_dashboard_metrics
+    from core.config import settings
+    
+    conn = load_orders([
+        f"{i},2024-01-{i % 28 + 1:02d}T10:00:00Z,Customer {i % 3000},\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"
+        for i in range(6000)
+    ])
+    start, end = datetime(2024, 1, 1, 12), datetime(2024, 1, 31)
+    for mode in ("rollup", "single_scan", "separate"):
+        monkeypatch.setattr(settings, "METRICS_QUERY_MODE", mode)
+        exact = compute_dashboard_metrics(conn, start, end)
+        approx = compute_dashboard_metrics(conn, start, end, approximate=True)
+        assert not exact.approximate and approx.approximate
+        assert approx.sales_metrics.unique_customers == pytest.approx(
+            exact.sales_metrics.unique_customers, rel=0.05
+        )
+        # Only customers are estimated; orders are counted exactly in every mode
+        assert approx.sales_metrics.total_orders == exact.sales_metrics.total_orders
+        assert [p.order_count for p in approx.time_series] == [p.order_count for p in exact.time_series]
+        assert [p.order_count for p in approx.top_products] == [p.order_count for p in exact.top_products]
+
+
+def test_columnar_format_matches_json(monkeypatch, load_orders):
+    """Test columnar responses carry the same values as the row format."""
+    import json
+    from datetime import datetime
+    from api.metrics import compute_dashboard_columns, compute_dashboard_metrics
+    from api.orders import _query_orders
+    from core.columnar import dumps
+    from core.config import settings
+    
+    conn = load_orders([
+        "1,2024-01-01T10:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,2,10.0\n",
+        "2,2024-01-02T11:00:00Z,Bob,\"2 Oak Ave, Denver CO 80202\",S2,Item 2,1,5.5\n",
+        "3,2024-01-02T12:00:00Z,Cy,\"3 Elm St, Austin TX 78701\",S1,Item 1,1,10.0\n",
+    ])
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31)
+    for mode in ("rollup", "separate"):
+        monkeypatch.setattr(settings, "METRICS_QUERY_MODE", mode)
+        rows = json.loads(compute_dashboard_metrics(conn, start, end).model_dump_json())
+        columns = json.loads(dumps(compute_dashboard_columns(conn, start, end)))
+        for section in ("top_products", "time_series", "geographic_distribution"):
+            transposed = [dict(zip(columns[section], values)) for values in zip(*columns[section].values())]
+            assert len(transposed) == len(rows[section])
+            for expected, actual in zip(rows[section], transposed):
+                assert expected.keys() == actual.keys()
+                for key, value in expected.items():
+                    if key == "revenue":
+                        assert actual[key] == pytest.approx(float(value))
+                    else:
+                        assert actual[key] == value
+    
+    response = _query_orders(conn, None, None, None, None, None, None, 10, 0, "columnar")
+    body = json.loads(response.body)
+    assert body["filtered_count"] == 3
+    assert sorted(body["orders"]["order_id"]) == ["1", "2", "3"]
+    assert body["orders"]["order_date"][0].startswith("2024-01-02")
+    assert body["orders"]["order_total"] == pytest.approx([10.0, 5.5, 20.0])
+
+
+def test_dashboard_time_series_granularity(monkeypatch, load_orders):
+    """Test time series buckets agree across modes and respect the point budget."""
+    from datetime import datetime, timedelta
+    from api.metrics import compute_dashboard_metrics, resolve_granularity
+    from core.config import settings
+    
+    first = datetime(2024, 1, 1, 6)
+    conn = load_orders([
+        f"{i},{(first + timedelta(hours=7 * i)).isoformat()}Z,Customer {i % 50},"
+        f"\"1 Main St, Austin TX 78701\",S{i % 4},Item {i % 4},1,{i % 17 + 1}.0\n"
+        for i in range(1000)
+    ])
+    start, end = datetime(2024, 1, 3, 12), datetime(2024, 9, 1)
+    assert resolve_granularity("auto", end - timedelta(hours=30), end) == "hour"
+    assert resolve_granularity("auto", start, start + timedelta(days=30)) == "day"
+    assert resolve_granularity("auto", start, end) == "week"
+    assert resolve_granularity("auto", start, start + timedelta(days=1000)) == "month"
+    
+    for granularity in ("hour", "day", "week", "month"):
+        series = {}
+        for mode in ("rollup", "single_scan", "separate"):
+            monkeypatch.setattr(settings, "METRICS_QUERY_MODE", mode)
+            metrics = compute_dashboard_metrics(conn, start, end, granularity=granularity)
+            assert metrics.granularity == granularity
+            series[mode] = [(p.date, p.revenue, p.order_count) for p in metrics.time_series]
+        assert series["rollup"] == series["single_scan"] == series["separate"]
+        assert sum(point[2] for point in series["rollup"]) == metrics.sales_metrics.total_orders
+    
+    full = compute_dashboard_metrics(conn, start, end, granularity="hour").time_series
+    sampled = compute_dashboard_metrics(conn, start, end, granularity="hour", max_points=50).time_series
+    assert len(full) > 50 and len(sampled) == 50
+    assert sampled[0] == full[0] and sampled[-1] == full[-1]
+    assert max(p.revenue for p in sampled) == max(p.revenue for p in full)
+    
+    # Browsers send aware dates; they are read as UTC like the stored orders
+    headers = get_auth_headers("viewer")
+    response = client.get("/api/metrics/dashboard", params={"start_date": "2024-01-01T00:00:00Z"}, headers=headers)
+    assert response.status_code == 200
+    aware = client.get(
+        "/api/metrics/dashboard",
+        params={"start_date": "2024-01-03T14:00:00+02:00", "end_date": "2024-09-01T00:00:00Z"},
+        headers=headers,
+    )
+    naive = client.get(
+        "/api/metrics/dashboard",
+        params={"start_date": start.isoformat(), "end_date": end.isoformat()},
+        headers=headers,
+    )
+    assert aware.status_code == 200 and aware.json() == naive.json()
+
+
+def test_dashboard_compare_previous_period(monkeypatch, load_orders):
+    """Test the comparison period matches a dashboard computed for that range."""
+    from datetime import datetime, timedelta
+    from api.metrics import comparison_range, compute_dashboard_metrics
+    from core.config import settings
+    
+    first = datetime(2024, 1, 1, 6)
+    conn = load_orders([
+        f"{i},{(first + timedelta(hours=7 * i)).isoformat()}Z,Customer {i % 70},"
+        f"\"1 Main St, {'Austin TX 78701' if i % 3 else 'Denver CO 80202'}\","
+        f"S{i % 4},Item {i % 4},1,{i % 17 + 1}.0\n"
+        for i in range(1000)
+    ])
+    start, end = datetime(2024, 5, 3, 12), datetime(2024, 6, 20, 8)
+    previous_start, previous_end = comparison_range("previous", start, end)
+    assert previous_end < start and previous_end - previous_start == end - start
+    
+    for mode in ("rollup", "single_scan", "separate"):
+        monkeypatch.setattr(settings, "METRICS_QUERY_MODE", mode)
+        metrics = compute_dashboard_metrics(conn, start, end, compare="previous")
+        before = compute_dashboard_metrics(conn, previous_start, previous_end)
+        assert metrics.sales_metrics == compute_dashboard_metrics(conn, start, end).sales_metrics
+        
+        comparison = metrics.comparison
+        assert comparison.sales_metrics == before.sales_metrics
+        assert comparison.changes["total_orders"] == pytest.approx(
+            (metrics.sales_metrics.total_orders / before.sales_metrics.total_orders - 1) * 100
+        )
+        previous_revenue = {product.item_sku: product.revenue for product in before.top_products}
+        assert [item.key for item in comparison.top_products] == [
+            product.item_sku for product in metrics.top_products
+        ]
+        assert all(
+            item.previous_revenue == previous_revenue[item.key] for item in comparison.top_products
+        )
+        assert {item.key: item.previous_order_count for item in comparison.geographic_distribution} == {
+            state.location: state.order_count for state in before.geographic_distribution
+        }
+        
+        yoy = compute_dashboard_metrics(conn, start, end, compare="yoy").comparison
+        assert yoy.sales_metrics.total_orders == 0
+        assert all(change is None for change in yoy.changes.values())
+    
+    headers = get_auth_headers("viewer")
+    params = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+    response = client.get("/api/metrics/dashboard", params={**params, "compare": "previous"}, headers=headers)
+    assert response.status_code == 200
+    comparison = response.json()["comparison"]
+    assert comparison["compare"] == "previous"
+    assert comparison["sales_metrics"]["total_orders"] == before.sales_metrics.total_orders
+    
+    response = client.get("/api/metrics/dashboard", params={
+        "start_date": "2023-01-01T00:00:00", "end_date": "2024-01-01T00:00:00", "compare": "yoy",
+    }, headers=headers)
+    assert response.status_code == 400
+    assert client.get("/api/metrics/dashboard", params={**params, "compare": "week"}, headers=headers).status_code == 422
+
+
+def test_map_cells_inside_bounding_box(load_orders):
+    """Test map cells come from geo_rollup keys and respect the box and zoom."""
+    import json
+    from datetime import datetime
+    from api.metrics import compute_map_metrics
+    
+    addresses = ["1 Main St, Austin TX 78701", "2 Oak Ave, Denver CO 80202", "3 Elm St, Austin TX 78702"]
+    conn = load_orders([
+        f"{i},2024-01-{i % 28 + 1:02d}T{i % 24:02d}:00:00Z,Customer {i},\"{addresses[i % 3]}\",S1,Item 1,1,10.0\n"
+        for i in range(300)
+    ])
+    start, end = datetime(2024, 1, 3, 12), datetime(2024, 1, 20, 6)
+    expected = conn.execute("""
+        SELECT zip_code, COUNT(*) FROM orders
+        WHERE order_date >= ? AND order_date <= ? GROUP BY zip_code
+    """, [start, end]).fetchall()
+    
+    zips = compute_map_metrics(conn, start, end, level="zip")
+    assert sorted((cell.location, cell.order_count) for cell in zips.cells) == sorted(expected)
+    assert zips.total_cells == 3 and all(cell.location_type == "zip" for cell in zips.cells)
+    
+    # Both Austin ZIPs share a cell at a coarse zoom but not at the finest
+    coarse = compute_map_metrics(conn, start, end, cell_zoom=6)
+    assert [len(cell.location) for cell in coarse.cells] == [6, 6]
+    assert sum(cell.order_count for cell in coarse.cells) == sum(count for _, count in expected)
+    
+    texas = compute_map_metrics(conn, start, end, bbox=(25.0, -107.0, 37.0, -93.0), cell_zoom=6)
+    assert len(texas.cells) == 1
+    assert texas.cells[0].order_count == sum(
+        count for zip_code, count in expected if zip_code.startswith("787")
+    )
+    assert texas.cells[0].latitude == pytest.approx(30.27, abs=0.1)
+    
+    headers = get_auth_headers("viewer")
+    params = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+    response = client.get("/api/metrics/map", params={
+        **params, "min_lat": 25, "min_lng": -107, "max_lat": 37, "max_lng": -93, "zoom": 3,
+    }, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == json.loads(texas.model_dump_json())
+    
+    response = client.get("/api/metrics/map", params={**params, "level": "zip"}, headers=headers)
+    assert response.json()["total_cells"] == 3
+    assert client.get("/api/metrics/map", params={"min_lat": 40, "max_lat": 30}, headers=headers).status_code == 400
+    assert client.get("/api/metrics/map", params={"level": "county"}, headers=headers).status_code == 422
+    assert client.get("/api/metrics/map", params={"min_lat": 91}, headers=headers).status_code == 422
+
+
+def test_weekday_hour_heatmap_matches_raw_orders(load_orders):
+    """Test the heatmap from hourly_rollup plus edge days matches raw orders."""
+    from datetime import datetime
+    from decimal import Decimal
+    
+    conn = load_orders([
+        f"{i},2024-01-{i % 28 + 1:02d}T{i * 7 % 24:02d}:30:00Z,Customer {i},"
+        f"\"1 Main St, Austin TX 78701\",S1,Item 1,1,{i % 9 + 1}.0\n"
+        for i in range(500)
+    ])
+    start, end = datetime(2024, 1, 2, 13), datetime(2024, 1, 25, 9)
+    response = client.get(
+        "/api/metrics/heatmap",
+        params={"start_date": start.isoformat(), "end_date": end.isoformat()},
+        headers=get_auth_headers("viewer"),
+    )
+    assert response.status_code == 200
+    heatmap = response.json()
+    expected = conn.execute("""
+        SELECT weekday, hour(order_date), SUM(order_total), COUNT(*) FROM orders
+        WHERE order_date >= ? AND order_date <= ?
+        GROUP BY ALL
+    """, [start, end]).fetchall()
+    
+    counts, revenues = heatmap["order_counts"], heatmap["revenue"]
+    assert len(counts) == 7 and all(len(row) == 24 for row in counts)
+    assert sum(map(sum, counts)) == sum(row[3] for row in expected)
+    for weekday, hour, revenue, order_count in expected:
+        assert counts[weekday][hour] == order_count
+        assert Decimal(revenues[weekday][hour]) == revenue
+    
+    assert client.get("/api/metrics/heatmap").status_code == 403
+
+
+def test_orders_keyset_pagination(load_orders):
+    """Test cursor pages walk the same rows as offsets, forwards and back."""
+    # Several orders share each timestamp, so order_id breaks ties
+    load_orders([
+        f"{i},2024-01-{i // 4 % 28 + 1:02d}T10:00:00Z,Customer {i},\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"
+        for i in range(23)
+    ])
+    headers = get_auth_headers("viewer")
+    
+    def get_page(**params):
+        response = client.get("/api/orders", params=params, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+    
+    expected = [order["order_id"] for order in get_page(limit=100)["orders"]]
+    
+    pages, cursor = [], None
+    while True:
+        page = get_page(limit=5, **({"cursor": cursor} if cursor else {}))
+        pages.append([order["order_id"] for order in page["orders"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sum(pages, []) == expected
+    assert [len(ids) for ids in pages] == [5, 5, 5, 5, 3]
+    
+    # Walk back from the last page with prev cursors
+    backwards, cursor = [], page["prev_cursor"]
+    while cursor is not None:
+        body = get_page(limit=5, cursor=cursor, format="columnar")
+        backwards.append(body["orders"]["order_id"])
+        cursor = body["prev_cursor"]
+    assert backwards == pages[-2::-1]
+    
+    # Offset pages hand out cursors too, and a cursor overrides the offset
+    middle = get_page(limit=5, offset=10)
+    assert get_page(limit=5, offset=15, cursor=middle["prev_cursor"])["orders"] == (
+        get_page(limit=5, offset=5)["orders"]
+    )
+    
+    for cursor in ("not-a-cursor", "WyJzaWRld2F5cyIsICIyMDI0LTAxLTAxIiwgIjEiXQ=="):
+        response = client.get("/api/orders", params={"cursor": cursor}, headers=headers)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_orders_counts_cached_and_estimated(load_orders):
+    """Test window counts are reused across pages and estimates are close."""
+    from datetime import datetime
+    from core.cache import order_count_cache
+    from core.database import clear_orders
+    
+    states = ["Austin TX 78701", "Denver CO 80202"]
+    conn = load_orders([
+        f"{i},2024-01-{i % 28 + 1:02d}T{i % 24:02d}:00:00Z,Customer {i},"
+        f"\"1 Main St, {states[i % 2]}\",S{i % 3},Item {i % 3},1,{i % 50 + 1}.0\n"
+        for i in range(2000)
+    ])
+    start, end = datetime(2024, 1, 3, 6), datetime(2024, 1, 20, 18)
+    exact = conn.execute("""
+        SELECT COUNT(*) FROM orders
+        WHERE order_date >= ? AND order_date <= ? AND state = 'TX'
+    """, [start, end]).fetchone()[0]
+    filters = {"start_date": start.isoformat(), "end_date": end.isoformat(), "state": "TX", "limit": 10}
+    headers = get_auth_headers("viewer")
+    
+    def get_page(**params):
+        response = client.get("/api/orders", params={**filters, **params}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+    
+    order_count_cache.clear()
+    first = get_page()
+    hits = order_count_cache.hits
+    later = get_page(format="columnar", cursor=first["next_cursor"])
+    assert first["filtered_count"] == later["filtered_count"] == exact
+    assert first["total_count"] == 2000 and order_count_cache.hits == hits + 1
+    order_count_cache.clear()
+    assert get_page(offset=5000)["filtered_count"] == exact
+    
+    order_count_cache.clear()
+    estimate = get_page(count="estimate")
+    assert estimate["count_estimated"]
+    assert estimate["filtered_count"] == pytest.approx(exact, rel=0.1)
+    bounded = get_page(count="estimate", min_total=10.0, max_total=30.0)
+    assert bounded["filtered_count"] == pytest.approx(exact * 21 / 50, rel=0.15)
+    
+    # Aware bounds are read as UTC, for exact and estimated counts alike
+    aware = {"start_date": "2024-01-03T08:00:00+02:00", "end_date": "2024-01-20T18:00:00Z"}
+    assert get_page(**aware)["filtered_count"] == exact
+    order_count_cache.clear()
+    assert get_page(count="estimate", **aware)["filtered_count"] == estimate["filtered_count"]
+    
+    response = client.get("/api/orders", params={"count": "bogus"}, headers=headers)
+    assert response.status_code == 422
+    
+    clear_orders()
+    assert get_page()["total_count"] == 0
+
+
+def test_orders_fast_format_matches_json(load_orders):
+    """Test the fast format returns the same JSON as the default format."""
+    rows = [
+        f"{i},2024-01-{i % 28 + 1:02d}T{i % 24:02d}:00:00Z,Customer {i},"
+        f"\"1 Main St, Austin TX 78701\",S{i % 3},Item {i % 3},{i % 4 + 1},{i % 90 + 1}.{i % 100:02d}\n"
+        for i in range(300)
+    ]
+    rows.append("x1,2024-01-05T10:00:00Z,Nobody,nowhere,S1,Item 1,1,3.00\n")
+    load_orders(rows)
+    filters = {"start_date": "2024-01-03T00:00:00", "min_total": 5.0, "limit": 40}
+    headers = get_auth_headers("viewer")
+    
+    default = client.get("/api/orders", params=filters, headers=headers)
+    fast = client.get("/api/orders", params={**filters, "format": "fast"}, headers=headers)
+    assert default.status_code == fast.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.json() == default.json()
+    
+    cursor = default.json()["next_cursor"]
+    assert (
+        client.get("/api/orders", params={**filters, "format": "fast", "cursor": cursor}, headers=headers).json()
+        == client.get("/api/orders", params={**filters, "cursor": cursor}, headers=headers).json()
+    )
+    
+    response = client.get("/api/orders", params={"format": "bogus"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_excel_export_streams_in_chunks(load_orders, monkeypatch):
+    """Test the Excel export streams a workbook matching the filtered orders."""
+    import asyncio
+    import io
+    import threading
+    from openpyxl import load_workbook
+    from api.export import EXPORT_COLUMNS, _write_excel
+    from core.config import settings
+    from core.database import run_read, stream_read
+    
+    states = ["Austin TX 78701", "Denver CO 80202"]
+    conn = load_orders([
+        f"{i},2024-01-{i % 28 + 1:02d}T{i % 24:02d}:00:00Z,Customer {'x' * (i % 7)}{i},"
+        f"\"1 Main St, {states[i % 2]}\",S{i % 3},Item {i % 3},{i % 4 + 1},{i % 90 + 1}.25\n"
+        for i in range(500)
+    ])
+    monkeypatch.setattr(settings, "EXPORT_BATCH_ROWS", 64)
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_BYTES", 4096)
+    
+    async def collect():
+        return [chunk async for chunk in stream_read(_write_excel, None, None, "TX", None)]
+    
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    
+    response = client.get("/api/export/excel", params={"state": "TX"}, headers=get_auth_headers("viewer"))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    assert response.headers["content-disposition"].endswith(".xlsx")
+    
+    worksheet = load_workbook(io.BytesIO(response.content))["Orders"]
+    exported = list(worksheet.values)
+    expected = conn.execute(f"""
+        SELECT {', '.join(EXPORT_COLUMNS)} FROM orders
+        WHERE state = 'TX' ORDER BY order_date DESC
+    """).fetchall()
+    assert exported[0] == tuple(EXPORT_COLUMNS)
+    assert len(exported) == len(expected) + 1 == 251
+    assert [row[0] for row in exported[1:]] == [row[0] for row in expected]
+    assert worksheet.column_dimensions["A"].width == len("order_id") + 2
+    assert worksheet.column_dimensions["C"].width == len("Customer xxxxxx498") + 2
+    
+    # A writer waiting on a slow client holds an export thread, and queries
+    # still run meanwhile
+    def write_thread_name(conn, out):
+        for _ in range(8):
+            out.write(threading.current_thread().name.encode().ljust(settings.EXPORT_CHUNK_BYTES))
+    
+    async def slow_client():
+        stream = stream_read(write_thread_name)
+        first = await stream.__anext__()
+        count = await asyncio.wait_for(
+            run_read(lambda conn: conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]), 5
+        )
+        await stream.aclose()
+        return first, count
+    
+    first, count = asyncio.run(slow_client())
+    assert first.decode().startswith("export") and count == 500
+    
+    async def disconnect():
+        stream = stream_read(_write_excel, None, None, None, None)
+        await stream.__anext__()
+        await stream.aclose()
+    
+    asyncio.run(disconnect())
+
+
+def test_csv_parquet_and_arrow_exports_match_orders(load_orders):
+    """Test the native export formats hold the filtered orders in order."""
+    import csv
+    import io
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from api.export import EXPORT_COLUMNS
+    
+    states = ["Austin TX 78701", "Denver CO 80202"]
+    conn = load_orders([
+        f"{i},2024-01-{i % 28 + 1:02d}T{i % 24:02d}:00:00Z,Customer {i},"
+        f"\"1 Main St, {states[i % 2]}\",S{i % 3},Item {i % 3},{i % 4 + 1},{i % 90 + 1}.25\n"
+        for i in range(300)
+    ])
+    expected = [row[0] for row in conn.execute("""
+        SELECT order_id FROM orders
+        WHERE state = 'CO' AND item_sku = 'S1' ORDER BY order_date DESC
+    """).fetchall()]
+    assert len(expected) == 50
+    
+    def export(path, media_type, extension):
+        response = client.get(
+            f"/api/export/{path}", params={"state": "CO", "item_sku": "S1"},
+            headers=get_auth_headers("viewer"),
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].split(";")[0] == media_type
+        assert response.headers["content-disposition"].startswith("attachment; filename=order_analytics_")
+        assert response.headers["content-disposition"].endswith(f".{extension}")
+        return response.content
+    
+    exported = list(csv.reader(io.StringIO(export("csv", "text/csv", "csv").decode())))
+    assert exported[0] == EXPORT_COLUMNS
+    assert [row[0] for row in exported[1:]] == expected
+    
+    table = pq.read_table(io.BytesIO(export("parquet", "application/vnd.apache.parquet", "parquet")))
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.column("order_id").to_pylist() == expected
+    
+    table = pa.ipc.open_stream(export("arrow", "application/vnd.apache.arrow.stream", "arrows")).read_all()
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.column("order_id").to_pylist() == expected
+    
+    assert client.get("/api/export/parquet").status_code == 403
+
+
+def test_database_calls_run_off_the_event_loop():
+    """Test reads run on the query pool and writers are serialized."""
+    import asyncio
+    import threading
+    import time
+    from core.database import init_db, run_read, run_write, write_lock
+    
+    init_db()
+    active_writers = []
+    overlaps = []
+    
+    def slow_write(conn):
+        active_writers.append(1)
+        overlaps.append(len(active_writers))
+        time.sleep(0.05)
+        active_writers.pop()
+    
+    async def scenario():
+        started = time.perf_counter()
+        slow = asyncio.ensure_future(run_read(lambda conn: time.sleep(0.3)))
+        await asyncio.sleep(0.01)
+        ticked = time.perf_counter() - started
+        await slow
+        
+        await asyncio.gather(*(run_write(slow_write) for _ in range(3)))
+        return ticked
+    
+    # The event loop kept running during the slow read
+    assert asyncio.run(scenario()) < 0.2
+    assert max(overlaps) == 1
+    
+    # A writer waiting on the write lock holds the writer thread, not a
+    # query thread
+    async def blocked_write():
+        write = asyncio.ensure_future(run_write(lambda conn: threading.current_thread().name))
+        await asyncio.sleep(0.05)
+        assert not write.done()
+        assert await run_read(lambda conn: conn.execute("SELECT 1").fetchone()[0]) == 1
+        write_lock.release()
+        return await write
+    
+    write_lock.acquire()
+    assert asyncio.run(blocked_write()).startswith("db-write")
@@ -73,4 +73,293 @@ def test_csv_validation():
     
     errors = processor.validate_csv_schema(df_invalid)
     assert len(errors) > 0
-    assert "Missing required columns" in errors[0]
\ No newline at end of file
+    assert "Missing required columns" in errors[0]
+
+def test_transform_orders():
+    """Test vectorized derivation of order columns."""
+    import pandas as pd
+    from core.database import init_db
+    init_db()
+    processor = DataProcessor()
+    
+    df = pd.DataFrame({
+        "order_id": [1, 2, 3],
+        "order_date": ["2024-01-01T10:30:00Z", "not a date", "2024-01-06"],
+        "customer_name": ["John Doe", "Jane Smith", "Ann Lee"],
+        "address_line": [
+            "123 Main St, New York NY 10001",
+            "456 Oak Ave, Austin TX 78701",
+            "400 Pine St, Seattle WA 98101",
+        ],
+        "item_sku": ["SKU001", "SKU002", "SKU003"],
+        "item_name": ["Item 1", "Item 2", "Item 3"],
+        "quantity": [2, 1, 3],
+        "unit_price_usd": [10.00, 20.00, 5.50]
+    })
+    
+    processed, failed = processor.transform_orders(df)
+    
+    assert processed["order_id"].tolist() == ["1", "3"]
+    assert processed["order_total"].tolist() == [20.0, 16.5]
+    assert processed["weekday"].tolist() == [0, 5]
+    assert str(processed["order_day"].iloc[0].date()) == "2024-01-01"
+    assert processed["state"].tolist() == ["NY", "WA"]
+    
+    assert failed["row"].tolist() == [3]
+    assert failed["order_id"].tolist() == ["2"]
+    assert failed["error"].tolist() == ["Invalid order_date"]
+
+
+def test_address_cache_eviction():
+    """Test address cache hit/miss counting and LRU eviction."""
+    import pandas as pd
+    from core.database import init_db, get_connection
+    from backend.services.address_cache import AddressCache
+    
+    init_db()
+    conn = get_connection()
+    conn.execute("DELETE FROM address_cache")
+    cache = AddressCache(max_entries=2)
+    
+    parsed = pd.DataFrame(
+        [
+            {"street": "1 A St", "city": "Austin", "state": "TX", "zip_code": "78701"},
+            {"street": "2 B St", "city": "Denver", "state": "CO", "zip_code": "80218"},
+            {"street": "3 C St", "city": "Boston", "state": "MA", "zip_code": "02116"},
+        ],
+        index=pd.Index(["a", "b", "c"], name="address_line"),
+    )
+    cache.put_many(conn, parsed)
+    assert cache.stats()["evictions"] == 1
+    
+    found = cache.get_many(conn, pd.Series(["a", "b", "c", "d"]))
+    assert len(found) == 2
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+    
+    # Batches in one transaction share CURRENT_TIMESTAMP; the later one stays
+    cache.max_entries = 1
+    conn.begin()
+    cache.put_many(conn, parsed.loc[["c"]].rename(index={"c": "z"}))
+    cache.put_many(conn, parsed.loc[["c"]].rename(index={"c": "y"}))
+    conn.commit()
+    assert cache.get_many(conn, pd.Series(["y", "z"])).index.tolist() == ["y"]
+
+
+def test_address_parsing_in_worker_processes(monkeypatch):
+    """Test the worker pool parses addresses like the in-process path."""
+    from core.config import settings
+    from services.data_processor import _get_executor, shutdown_workers
+    
+    processor = DataProcessor()
+    addresses = [
+        f"{i} Main St, {city}"
+        for i, city in enumerate(["Austin TX 78701", "Denver, CO 80202", "Apt 4, Boston MA 02116"] * 4)
+    ]
+    expected = [processor.parse_address(address) for address in addresses]
+    
+    shutdown_workers()
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 2)
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 5)
+    try:
+        assert _get_executor() is not None
+        assert processor._parse_address_list(addresses) == expected
+    finally:
+        shutdown_workers()
+
+
+def test_process_csv_in_chunks(monkeypatch):
+    """Test chunked CSV ingest with duplicates split across chunks."""
+    from core.config import settings
+    from core.database import init_db, clear_orders, get_connection
+    
+    init_db()
+    clear_orders()
+    monkeypatch.setattr(settings, "INGEST_CHUNK_ROWS", 2)
+    processor = DataProcessor()
+    
+    csv = (
+        "order_id,order_date,customer_name,address_line,item_sku,item_name,quantity,unit_price_usd\n"
+        "1,2024-01-01,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"
+        "2,2024-01-02,Bob,\"2 Main St, Austin TX 78701\",S1,Item 1,2,10.0\n"
+        "3,2024-01-03,Cy,\"3 Main St, Austin TX 78701\",S2,Item 2,1,5.0\n"
+        "1,2024-01-04,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,9,10.0\n"
+        "4,2024-01-05,Di,\"4 Main St, Austin TX 78701\",S2,Item 2,1,5.0\n"
+    ).encode()
+    
+    result = processor.process_csv(csv)
+    assert result["success"]
+    assert result["rows_processed"] == 4
+    assert set(result["timings"]) == {"read", "validate", "parse", "enrich", "insert", "rollup"}
+    
+    conn = get_connection()
+    assert conn.execute("SELECT quantity FROM orders WHERE order_id = '1'").fetchone()[0] == 1
+    
+    # A chunk that fails validation rolls back the whole upload, including
+    # the clear of the previous data in replace mode
+    bad = csv + b"5,2024-01-06,Ed,\"5 Main St, Austin TX 78701\",S2,Item 2,lots,5.0\n"
+    result = processor.process_csv(bad)
+    assert not result["success"]
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 4
+    assert conn.execute("SELECT SUM(order_count) FROM daily_rollup").fetchone()[0] == 4
+    
+    # A good replace swaps the data
+    result = processor.process_csv(csv.replace(b"S2,Item 2,1,5.0", b"S2,Item 2,3,5.0"))
+    assert result["success"]
+    assert conn.execute("SELECT SUM(quantity) FROM orders").fetchone()[0] == 1 + 2 + 3 + 3
+
+
+def test_duckdb_engine_matches_pandas(tmp_path, monkeypatch):
+    """Test that the native DuckDB ingest engine matches the pandas engine."""
+    from core.config import settings
+    from core.database import init_db, clear_orders, get_connection
+    
+    init_db()
+    processor = DataProcessor()
+    conn = get_connection()
+    
+    path = tmp_path / "orders.csv"
+    path.write_text(
+        "order_id,order_date,customer_name,address_line,item_sku,item_name,quantity,unit_price_usd\n"
+        "1,2024-01-01T10:30:00Z,Ann,\"123 Main St, New York NY 10005\",S1,Item 1,2,10.0\n"
+        "2,2024-01-06T08:00:00Z,Bob,\"400 Pine St, Seattle WA 98101\",S2,Item 2,1,5.5\n"
+        "1,2024-01-07T09:00:00Z,Ann,\"123 Main St, New York NY 10005\",S1,Item 1,9,10.0\n"
+    )
+    
+    rows = {}
+    for engine in ("pandas", "duckdb"):
+        monkeypatch.setattr(settings, "INGEST_ENGINE", engine)
+        clear_orders()
+        result = processor.process_csv_file(str(path))
+        assert result["rows_processed"] == 2
+        rows[engine] = conn.execute(
+            "SELECT * EXCLUDE (upload_timestamp) FROM orders ORDER BY order_id"
+        ).fetchall()
+    
+    assert rows["pandas"] == rows["duckdb"]
+    
+    # Naive and non-ISO dates read the same, as UTC rather than the
+    # database's local zone
+    zone = conn.execute("SELECT current_setting('TimeZone')").fetchone()[0]
+    conn.execute("SET GLOBAL TimeZone = 'America/New_York'")
+    try:
+        for dates, expected in [
+            (("2024-01-08 10:00", "2024-01-09 11:15"), ["2024-01-08 10:00:00", "2024-01-09 11:15:00"]),
+            (("2024-01-08T10:00:00+02:00", "2024-01-09T10:00:00-05:00"), ["2024-01-08 08:00:00", "2024-01-09 15:00:00"]),
+            (("01/15/2024", "1/16/2024"), ["2024-01-15 00:00:00", "2024-01-16 00:00:00"]),
+            (("01/15/2024 2:30 PM", "1/16/2024 9:05 AM"), ["2024-01-15 14:30:00", "2024-01-16 09:05:00"]),
+        ]:
+            path.write_text(
+                "order_id,order_date,customer_name,address_line,item_sku,item_name,quantity,unit_price_usd\n"
+                + "".join(
+                    f"{i},{date},Cy,\"400 Pine St, Seattle WA 98101\",S2,Item 2,1,5.5\n"
+                    for i, date in enumerate(dates)
+                )
+            )
+            for engine in ("pandas", "duckdb"):
+                monkeypatch.setattr(settings, "INGEST_ENGINE", engine)
+                clear_orders()
+                assert processor.process_csv_file(str(path))["rows_processed"] == 2
+                stored = conn.execute("SELECT order_date FROM orders ORDER BY order_id").fetchall()
+                assert [str(row[0]) for row in stored] == expected, (engine, dates)
+    finally:
+        conn.execute(f"SET GLOBAL TimeZone = '{zone}'")
+    
+    # Validation errors are reported the same way
+    path.write_text("order_id,customer_name\n1,Ann\n")
+    result = processor.process_csv_file(str(path))
+    assert not result["success"]
+    assert "Missing required columns" in result["errors"][0]
+
+
+def test_append_and_upsert_modes(tmp_path, monkeypatch):
+    """Test incremental append and upsert uploads on both engines."""
+    import shutil
+    from core.config import settings
+    from core.database import init_db, clear_orders, get_connection
+    from services.ingest_jobs import IngestJobManager
+    
+    init_db()
+    processor = DataProcessor()
+    conn = get_connection()
+    header = "order_id,order_date,customer_name,address_line,item_sku,item_name,quantity,unit_price_usd\n"
+    first = tmp_path / "first.csv"
+    first.write_text(
+        header
+        + "1,2024-01-01T10:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"
+        + "2,2024-01-02T10:00:00Z,Bob,\"2 Main St, Austin TX 78701\",S1,Item 1,2,10.0\n"
+    )
+    delta = tmp_path / "delta.csv"
+    delta.write_text(
+        header
+        + "2,2024-01-02T10:00:00Z,Bob,\"2 Main St, Denver CO 80218\",S1,Item 1,5,10.0\n"
+        + "3,2024-01-03T10:00:00Z,Cy,\"3 Main St, Austin TX 78701\",S2,Item 2,1,5.0\n"
+    )
+    
+    for engine in ("pandas", "duckdb"):
+        monkeypatch.setattr(settings, "INGEST_ENGINE", engine)
+        clear_orders()
+        processor.process_csv_file(str(first))
+        
+        result = processor.process_csv_file(str(delta), mode="append")
+        assert (result["inserted"], result["updated"], result["skipped"]) == (1, 0, 1)
+        assert conn.execute("SELECT quantity FROM orders WHERE order_id = '2'").fetchone()[0] == 2
+        
+        result = processor.process_csv_file(str(delta), mode="upsert")
+        assert (result["inserted"], result["updated"], result["skipped"]) == (0, 2, 0)
+        assert conn.execute(
+            "SELECT quantity, state FROM orders WHERE order_id = '2'"
+        ).fetchone() == (5, "CO")
+        assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 3
+        
+        # Appending only known orders changes nothing but still succeeds
+        result = processor.process_csv_file(str(first), mode="append")
+        assert result["success"] and not result["errors"]
+        assert (result["inserted"], result["updated"], result["skipped"]) == (0, 0, 2)
+        
+        manager = IngestJobManager()
+        spooled = tmp_path / "spooled.csv"
+        shutil.copy(first, spooled)
+        job = manager.submit(str(spooled), "first.csv", "append")
+        manager.shutdown()
+        assert job.status == "succeeded" and job.error is None
+        assert job.result["skipped"] == 2
+
+
+def test_batch_coordinate_lookup():
+    """Test vectorized ZIP lookup with ZIP+4 and ZIP3 prefix fallback."""
+    import numpy as np
+    from backend.services.zipcode_data import lookup_coordinates
+    
+    lat, lng = lookup_coordinates(["10001", "10001-1234", "10099", "00000", "", None])
+    
+    assert lat[0] == lat[1]
+    assert lng[0] == lng[1]
+    assert 40 < lat[2] < 41  # Falls back to the 100xx prefix centroid
+    assert np.isnan(lat[3:]).all()
+    assert np.isnan(lng[3:]).all()
+
+
+def test_persistent_database_warm_restart(tmp_path, monkeypatch):
+    """Test that a persistent database keeps orders across restarts."""
+    from core.config import settings
+    from core.database import init_db, close_connection, get_connection
+    
+    close_connection()
+    monkeypatch.setattr(settings, "DATABASE_PERSISTENT", True)
+    monkeypatch.setattr(settings, "DATABASE_PATH", str(tmp_path / "analytics.db"))
+    try:
+        init_db()
+        processor = DataProcessor()
+        csv = (
+            "order_id,order_date,customer_name,address_line,item_sku,item_name,quantity,unit_price_usd\n"
+            "1,2024-01-01T10:00:00Z,Ann,\"1 Main St, Austin TX 78701\",S1,Item 1,1,10.0\n"
+        ).encode()
+        assert processor.process_csv(csv)["success"]
+        close_connection()
+        
+        # Reopening an up-to-date file is cheap and keeps the data
+        assert init_db() < 1.0
+        assert get_connection().execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 1
+    finally:
+        close_connection()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Benchmark CSV ingestion at several sizes and write a JSON report.
+
+Each run generates a seeded CSV with ``generate_dummy_data`` (cached in
+``--data-dir`` so reruns skip generation), then ingests it in a fresh
+subprocess against an in-memory database. The report records total and
+per-stage time (read, validate, parse, enrich, insert, rollup), rows/sec
+and peak RSS for every size and engine:
+
+    python scripts/benchmark_ingest.py --sizes 10000 1000000
+    python scripts/benchmark_ingest.py --output after.json --compare before.json
+
+With ``--compare`` the script exits non-zero when any run's rows/sec falls
+more than ``--tolerance`` below the baseline report.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from generate_dummy_data import iter_orders, write_orders_csv
+
+# Configuration
+ROOT_DIR = Path(__file__).parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+DEFAULT_ENGINES = ["pandas", "duckdb"]
+DEFAULT_SEED = 42
+STAGES = ["read", "validate", "parse", "enrich", "insert", "rollup"]
+
+
+def dataset_path(data_dir, rows, seed):
+    """Generate (once) and return the CSV for a size and seed."""
+    path = data_dir / f"orders_{rows}_seed{seed}.csv"
+    if not path.exists():
+        print(f"Generating {rows:,} rows -> {path}")
+        partial = path.with_suffix(".partial")
+        write_orders_csv(partial, iter_orders(rows, seed, vary_street_numbers=True))
+        partial.rename(path)
+    return path
+
+
+def peak_rss_mb(who):
+    """Peak resident set size in MB for this process or its children."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_child(csv_path, result_path):
+    """Ingest one file and write the measurements to ``result_path``."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from core.database import init_db
+    from services.data_processor import data_processor, shutdown_workers
+
+    init_db()
+    started = time.perf_counter()
+    result = data_processor.process_csv_file(str(csv_path), mode="replace")
+    seconds = time.perf_counter() - started
+    shutdown_workers()
+
+    with open(result_path, "w") as f:
+        json.dump({
+            "seconds": seconds,
+            "success": result["success"],
+            "rows_processed": result["rows_processed"],
+            "errors": result["errors"],
+            "stages": result.get("timings", {}),
+            "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+            "worker_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        }, f)
+
+
+def measure(csv_path, rows, engine):
+    """Run one ingest in a fresh interpreter and summarize it."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    try:
+        env = dict(os.environ, INGEST_ENGINE=engine, DATABASE_PERSISTENT="false")
+        subprocess.run(
+            [sys.executable, __file__, "--child", str(csv_path), result_path],
+            env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        with open(result_path) as f:
+            run = json.load(f)
+    finally:
+        os.unlink(result_path)
+
+    rows_processed = run["rows_processed"]
+    run.update({
+        "rows": rows,
+        "engine": engine,
+        "rows_per_second": rows_processed / run["seconds"] if run["seconds"] > 0 else 0.0,
+        "stage_rows_per_second": {
+            stage: rows_processed / seconds
+            for stage, seconds in run["stages"].items() if seconds > 0
+        },
+    })
+    return run
+
+
+def compare(report, baseline, tolerance):
+    """Return descriptions of runs that regressed against the baseline."""
+    previous = {(run["rows"], run["engine"]): run for run in baseline["runs"]}
+    regressions = []
+    for run in report["runs"]:
+        before = previous.get((run["rows"], run["engine"]))
+        if before is None or not before["rows_per_second"]:
+            continue
+        change = run["rows_per_second"] / before["rows_per_second"] - 1
+        if change < -tolerance:
+            regressions.append(
+                f"{run['engine']} @ {run['rows']:,} rows: "
+                f"{before['rows_per_second']:,.0f} -> {run['rows_per_second']:,.0f} rows/s "
+                f"({change:+.1%})"
+            )
+    return regressions
+
+
+def main():
+    """Run the benchmark matrix and write the report."""
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to benchmark")
+    parser.add_argument("--engines", nargs="+", default=DEFAULT_ENGINES, choices=DEFAULT_ENGINES)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed for the generated data")
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "ingest-benchmark",
+                        help="where generated CSVs are cached")
+    parser.add_argument("--output", type=Path, default=ROOT_DIR / "benchmark_report.json",
+                        help="JSON report to write")
+    parser.add_argument("--compare", type=Path, help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed rows/sec drop versus the baseline (fraction)")
+    args = parser.parse_args()
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+
+    for rows in args.sizes:
+        csv_path = dataset_path(args.data_dir, rows, args.seed)
+        for engine in args.engines:
+            run = measure(csv_path, rows, engine)
+            report["runs"].append(run)
+            stages = "  ".join(f"{stage}={run['stages'].get(stage, 0):.2f}s" for stage in STAGES)
+            print(
+                f"{engine:>6} {rows:>11,} rows: {run['seconds']:8.2f}s "
+                f"{run['rows_per_second']:>12,.0f} rows/s  "
+                f"peak {run['peak_rss_mb']:,.0f} MB  {stages}"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Throughput regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"✓ No regressions beyond {args.tolerance:.0%} versus {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Build the bundled ZIP centroid index used by services/zipcode_data.
+
+The index is written as two NumPy arrays so the backend can memory-map it
+at startup instead of parsing a large Python literal:
+
+- zip_codes.npy        sorted uint32 ZIP codes
+- zip_coordinates.npy  float32 (latitude, longitude) pairs, row-aligned
+
+Coordinates come from the ``zipcodes`` package (GeoNames data, CC BY 4.0),
+which is only needed to rebuild the index:
+
+    pip install zipcodes
+    python scripts/build_zip_centroids.py
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+# Configuration
+OUTPUT_DIR = Path(__file__).parent.parent / "backend" / "services" / "data"
+
+
+def load_centroids():
+    """Load (zip, lat, lng) tuples for every ZIP with coordinates."""
+    import zipcodes
+
+    rows = {}
+    for record in zipcodes.list_all():
+        if not record["lat"] or not record["long"]:
+            continue
+        rows[int(record["zip_code"])] = (float(record["lat"]), float(record["long"]))
+    return sorted(rows.items())
+
+
+def main():
+    """Write the sorted ZIP keys and coordinate arrays."""
+    print("Building ZIP centroid index...")
+
+    centroids = load_centroids()
+    zip_codes = np.array([zip_code for zip_code, _ in centroids], dtype=np.uint32)
+    coordinates = np.array([coords for _, coords in centroids], dtype=np.float32)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    np.save(OUTPUT_DIR / "zip_codes.npy", zip_codes)
+    np.save(OUTPUT_DIR / "zip_coordinates.npy", coordinates)
+
+    print(f"✓ Indexed {len(zip_codes)} ZIP codes")
+    print(f"✓ Saved to: {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
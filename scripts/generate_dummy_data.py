@@ -1,6 +1,15 @@
 #!/usr/bin/env python3
-"""Generate dummy order data for the analytics dashboard prototype."""
+"""Generate dummy order data for the analytics dashboard prototype.
 
+Usage:
+    python scripts/generate_dummy_data.py
+    python scripts/generate_dummy_data.py --rows 1000000 --seed 42 --output big.csv
+
+With ``--seed`` the output is fully reproducible: order ids come from the
+seeded generator and dates are relative to a fixed reference date.
+"""
+
+import argparse
 import csv
 import random
 from datetime import datetime, timedelta
@@ -12,6 +21,12 @@ NUM_ORDERS = 1000
 NUM_CUSTOMERS = 200
 OUTPUT_FILE = "dummy_orders.csv"
 
+# Seeded runs date orders relative to this instead of the current time
+REFERENCE_DATE = datetime(2024, 6, 30, 12, 0, 0)
+
+FIELDNAMES = ["order_id", "order_date", "customer_name", "address_line",
+              "item_sku", "item_name", "quantity", "unit_price_usd"]
+
 # Product catalog
 PRODUCTS = [
     {"sku": "SKU-A12-BLK", "name": "Transit Backpack", "price": 79.00},
@@ -118,10 +133,10 @@ def generate_customer_name():
     """Generate a random customer name."""
     return f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
 
-def generate_order_date():
-    """Generate a random order date within the last 180 days."""
+def generate_order_date(now=None):
+    """Generate a random order date within the 180 days before ``now``."""
     days_ago = random.randint(0, 180)
-    order_date = datetime.now() - timedelta(days=days_ago)
+    order_date = (now or datetime.now()) - timedelta(days=days_ago)
     # Add random time of day
     hours = random.randint(0, 23)
     minutes = random.randint(0, 59)
@@ -129,66 +144,96 @@ def generate_order_date():
     order_date = order_date.replace(hour=hours, minute=minutes, second=seconds)
     return order_date.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def generate_orders():
-    """Generate dummy order data."""
-    orders = []
-    
-    # Generate unique customer names
-    customers = []
-    while len(customers) < NUM_CUSTOMERS:
-        name = generate_customer_name()
-        if name not in customers:
-            customers.append(name)
-    
-    for _ in range(NUM_ORDERS):
-        # Select random product
-        product = random.choice(PRODUCTS)
-        
-        # Select random customer
-        customer = random.choice(customers)
-        
-        # Select random address
-        address = random.choice(ADDRESSES)
-        address_line = f"{address['street']}, {address['city']} {address['state']} {address['zip']}"
-        
-        # Generate quantity (weighted towards 1-2 items)
-        quantity_weights = [0.6, 0.25, 0.1, 0.05]
-        quantity = random.choices([1, 2, 3, 4], weights=quantity_weights)[0]
-        
-        order = {
-            "order_id": str(uuid.uuid4()),
-            "order_date": generate_order_date(),
-            "customer_name": customer,
-            "address_line": address_line,
-            "item_sku": product["sku"],
-            "item_name": product["name"],
-            "quantity": quantity,
-            "unit_price_usd": product["price"]
-        }
+def iter_orders(num_orders=NUM_ORDERS, seed=None, vary_street_numbers=False):
+    """Yield dummy orders one at a time.
+    
+    With a ``seed`` the sequence is reproducible. ``vary_street_numbers``
+    randomizes house numbers so most addresses are distinct, which is
+    closer to real uploads than the small fixed address list.
+    """
+    rng_state = random.getstate()
+    now = None
+    if seed is not None:
+        random.seed(seed)
+        now = REFERENCE_DATE
+    
+    try:
+        # Generate unique customer names
+        customers = []
+        while len(customers) < NUM_CUSTOMERS:
+            name = generate_customer_name()
+            if name not in customers:
+                customers.append(name)
         
-        orders.append(order)
+        for _ in range(num_orders):
+            # Select random product
+            product = random.choice(PRODUCTS)
+            
+            # Select random customer
+            customer = random.choice(customers)
+            
+            # Select random address
+            address = random.choice(ADDRESSES)
+            street = address['street']
+            if vary_street_numbers:
+                street = f"{random.randint(1, 9999)} {street.split(' ', 1)[1]}"
+            address_line = f"{street}, {address['city']} {address['state']} {address['zip']}"
+            
+            # Generate quantity (weighted towards 1-2 items)
+            quantity_weights = [0.6, 0.25, 0.1, 0.05]
+            quantity = random.choices([1, 2, 3, 4], weights=quantity_weights)[0]
+            
+            yield {
+                "order_id": str(uuid.UUID(int=random.getrandbits(128), version=4)),
+                "order_date": generate_order_date(now),
+                "customer_name": customer,
+                "address_line": address_line,
+                "item_sku": product["sku"],
+                "item_name": product["name"],
+                "quantity": quantity,
+                "unit_price_usd": product["price"]
+            }
+    finally:
+        if seed is not None:
+            random.setstate(rng_state)
+
+def generate_orders(num_orders=NUM_ORDERS, seed=None):
+    """Generate dummy order data, newest first."""
+    orders = list(iter_orders(num_orders, seed))
     
     # Sort by date (newest first)
     orders.sort(key=lambda x: x["order_date"], reverse=True)
     
     return orders
 
+def write_orders_csv(output_path, orders):
+    """Write orders (any iterable) to a CSV file and return the row count."""
+    count = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        
+        writer.writeheader()
+        for order in orders:
+            writer.writerow(order)
+            count += 1
+    return count
+
 def main():
     """Generate dummy data and save to CSV."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=NUM_ORDERS, help="number of orders")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible output")
+    parser.add_argument("--output", type=Path, default=Path(__file__).parent.parent / OUTPUT_FILE,
+                        help="CSV file to write")
+    args = parser.parse_args()
+    
     print("Generating dummy order data...")
     
-    orders = generate_orders()
+    orders = generate_orders(args.rows, args.seed)
     
     # Write to CSV
-    output_path = Path(__file__).parent.parent / OUTPUT_FILE
-    
-    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ["order_id", "order_date", "customer_name", "address_line", 
-                     "item_sku", "item_name", "quantity", "unit_price_usd"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        writer.writeheader()
-        writer.writerows(orders)
+    output_path = args.output
+    write_orders_csv(output_path, orders)
     
     print(f"✓ Generated {len(orders)} orders")
     print(f"✓ Saved to: {output_path}")